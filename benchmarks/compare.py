@@ -0,0 +1,81 @@
+"""Compare two ``benchmarks.load`` result files.
+
+Prints the change of every metric per scenario and exits with 1 if
+any of them got worse by more than ``--threshold`` percent.
+
+    python -m benchmarks.compare benchmarks/results/abc1234.json \\
+        benchmarks/results/def5678.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+# Метрика -> True, если больше - лучше
+METRICS = {
+    "rps": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "peak_rss_mb": False,
+    "files_per_s": True,
+}
+
+
+def _load(path: str) -> tuple[str, dict[str, dict]]:
+    with open(path) as f:
+        data = json.load(f)
+    return data.get("commit", path), {
+        s["scenario"]: s for s in data["scenarios"]}
+
+
+def _change(old: float, new: float) -> float | None:
+    if not old:
+        return None
+    return (new - old) / old * 100
+
+
+def compare(old: dict[str, dict], new: dict[str, dict], threshold: float):
+    rows, regressions = [], []
+    for name in sorted(old.keys() & new.keys()):
+        before, after = old[name], new[name]
+        if "failed" in before or "failed" in after:
+            rows.append((name, "failed", "", "", ""))
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if metric not in before or metric not in after:
+                continue
+            change = _change(before[metric], after[metric])
+            worse = change is not None and (
+                -change if higher_is_better else change) > threshold
+            if worse:
+                regressions.append((name, metric))
+            rows.append((
+                name, metric, before[metric], after[metric],
+                "" if change is None else
+                f"{change:+.1f}%{' REGRESSION' if worse else ''}"))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument(
+        "--threshold", type=float, default=10.0,
+        help="allowed slowdown, percent")
+    args = parser.parse_args()
+    old_commit, old = _load(args.old)
+    new_commit, new = _load(args.new)
+    rows, regressions = compare(old, new, args.threshold)
+    print(f"{'scenario':<16}{'metric':<22}{old_commit:>12}"
+          f"{new_commit:>12}  change")
+    for name, metric, before, after, change in rows:
+        print(f"{name:<16}{metric:<22}{before!s:>12}{after!s:>12}  {change}")
+    for name in sorted(old.keys() ^ new.keys()):
+        print(f"{name:<16}only in {'old' if name in old else 'new'} run")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Event-loop lag under concurrent logins.
+
+Compares verifying bcrypt hashes inline in the coroutine (the old login
+path) with the bounded executor from ``auth.security``. A ticker
+coroutine measures how late the loop wakes it up while the logins run.
+
+    python -m benchmarks.password_hashing --logins 64 --rounds 12
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+
+async def _ticker(lags: list[float], stop: asyncio.Event, interval: float):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def _scenario(mode: str, logins: int, hashed: str) -> dict:
+    from src.app.auth import security
+
+    async def inline_login():
+        assert security.verify_password("secret", hashed)
+
+    async def executor_login():
+        ok, _ = await security.verify_and_update_async("secret", hashed)
+        assert ok
+
+    login = inline_login if mode == "inline" else executor_login
+    lags: list[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop, 0.005))
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(login() for _ in range(logins)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    shed = sum(1 for r in results if isinstance(r, Exception))
+    return {
+        "mode": mode,
+        "logins": logins,
+        "shed": shed,
+        "elapsed_s": round(elapsed, 3),
+        "lag_p50_ms": round(statistics.median(lags_ms), 2),
+        "lag_p99_ms": round(
+            lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))], 2),
+        "lag_max_ms": round(lags_ms[-1], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    # Очередь не должна резать нагрузку в этом замере
+    os.environ.setdefault("PASSWORD_HASH_QUEUE_LIMIT", str(args.logins))
+    from src.app.auth.security import hash_password
+    hashed = hash_password("secret")
+    for mode in ("inline", "executor"):
+        print(json.dumps(asyncio.run(_scenario(mode, args.logins, hashed))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""Local stand-ins for the services the API talks to.
+
+``LocalS3`` answers the subset of the ``Minio`` client API that
+``storage.minio_client`` and ``storage.ranged_reader`` use and keeps
+objects as files under a directory, so spawned extraction processes
+see the same objects as the API process. Installing it replaces the
+``Minio`` class behind ``get_minio_client``: every caller, including
+modules that imported the getter by name, gets the stub. Redis is
+replaced by ``tests.fakes.install_fake_redis``, shared with the tests.
+"""
+import functools
+import hashlib
+import multiprocessing
+import os
+import shutil
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from minio.datatypes import Object
+from minio.error import S3Error
+
+BENCH_ENDPOINT = "http://bench-s3.local"
+
+
+class _Response:
+    # То, что minio отдаёт из get_object: read/stream/close/release_conn
+
+    def __init__(self, path: str, offset: int, length: int):
+        self._f = open(path, "rb")
+        self._f.seek(offset)
+        self._left = length or -1
+
+    def read(self, amt: int | None = None) -> bytes:
+        if self._left == 0:
+            return b""
+        n = -1 if self._left < 0 else self._left
+        if amt is not None and (n < 0 or amt < n):
+            n = amt
+        data = self._f.read(n)
+        if self._left > 0:
+            self._left -= len(data)
+        return data
+
+    def stream(self, amt: int = 64 * 1024):
+        while True:
+            chunk = self.read(amt)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self) -> None:
+        self._f.close()
+
+    def release_conn(self) -> None:
+        pass
+
+
+class _Written:
+    def __init__(self, etag: str):
+        self.etag = etag
+
+
+class LocalS3:
+    def __init__(self, root: str, **kwargs):
+        self._root = root
+
+    def _bucket(self, bucket: str) -> str:
+        return os.path.join(self._root, bucket)
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self._bucket(bucket), key)
+
+    def _parts(self, bucket: str, upload_id: str) -> str:
+        return os.path.join(self._root, ".uploads", bucket, upload_id)
+
+    def _missing(self, code: str, bucket: str, key: str) -> S3Error:
+        return S3Error(
+            None, code, f"{key} not found", key, "bench", "bench",
+            bucket_name=bucket, object_name=key)
+
+    def bucket_exists(self, bucket: str) -> bool:
+        return os.path.isdir(self._bucket(bucket))
+
+    def make_bucket(self, bucket: str) -> None:
+        os.makedirs(self._bucket(bucket), exist_ok=True)
+
+    def put_object(
+            self,
+            bucket: str,
+            key: str,
+            data,
+            length: int,
+            content_type: str = "application/octet-stream",
+            part_size: int = 0,
+            num_parallel_uploads: int = 1,
+            **kwargs) -> _Written:
+        digest = hashlib.md5()
+        path = self._path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        chunk_size = part_size or 1024 * 1024
+        with open(path, "wb") as f:
+            left = length
+            while left != 0:
+                chunk = data.read(
+                    chunk_size if left < 0 else min(left, chunk_size))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+                if left > 0:
+                    left -= len(chunk)
+        return _Written(digest.hexdigest())
+
+    def _create_multipart_upload(
+            self,
+            bucket: str,
+            key: str,
+            headers: dict) -> str:
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._parts(bucket, upload_id))
+        return upload_id
+
+    def _upload_part(
+            self,
+            bucket: str,
+            key: str,
+            data: bytes,
+            headers,
+            upload_id: str,
+            part_number: int) -> str:
+        with open(os.path.join(
+                self._parts(bucket, upload_id), str(part_number)), "wb") as f:
+            f.write(data)
+        return hashlib.md5(data).hexdigest()
+
+    def _complete_multipart_upload(
+            self,
+            bucket: str,
+            key: str,
+            upload_id: str,
+            parts) -> _Written:
+        parts_dir = self._parts(bucket, upload_id)
+        path = self._path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as out:
+            for part in parts:
+                with open(os.path.join(
+                        parts_dir, str(part.part_number)), "rb") as f:
+                    shutil.copyfileobj(f, out)
+        shutil.rmtree(parts_dir)
+        return _Written(f"{uuid.uuid4().hex}-{len(parts)}")
+
+    def _abort_multipart_upload(
+            self,
+            bucket: str,
+            key: str,
+            upload_id: str) -> None:
+        parts_dir = self._parts(bucket, upload_id)
+        if not os.path.isdir(parts_dir):
+            raise self._missing("NoSuchUpload", bucket, key)
+        shutil.rmtree(parts_dir)
+
+    def _object(self, bucket: str, key: str) -> Object:
+        st = os.stat(self._path(bucket, key))
+        return Object(
+            bucket,
+            key,
+            last_modified=datetime.fromtimestamp(st.st_mtime, timezone.utc),
+            etag=f"{st.st_ino:x}{st.st_mtime_ns:x}",
+            size=st.st_size)
+
+    def stat_object(self, bucket: str, key: str) -> Object:
+        if not os.path.isfile(self._path(bucket, key)):
+            raise self._missing("NoSuchKey", bucket, key)
+        return self._object(bucket, key)
+
+    def get_object(
+            self,
+            bucket: str,
+            key: str,
+            offset: int = 0,
+            length: int = 0) -> _Response:
+        path = self._path(bucket, key)
+        if not os.path.isfile(path):
+            raise self._missing("NoSuchKey", bucket, key)
+        return _Response(path, offset, length)
+
+    def remove_object(self, bucket: str, key: str) -> None:
+        try:
+            os.remove(self._path(bucket, key))
+        except FileNotFoundError:
+            pass
+
+    def remove_objects(self, bucket: str, delete_objects):
+        for obj in delete_objects:
+            self.remove_object(bucket, obj.name)
+        return iter(())
+
+    def list_objects(
+            self,
+            bucket: str,
+            prefix: str | None = None,
+            recursive: bool = False):
+        base = self._bucket(bucket)
+        for dirpath, _, names in os.walk(base):
+            for name in names:
+                key = os.path.relpath(os.path.join(dirpath, name), base)
+                if not prefix or key.startswith(prefix):
+                    yield self._object(bucket, key)
+
+    def presigned_put_object(self, bucket_name, object_name, expires):
+        return f"{BENCH_ENDPOINT}/{bucket_name}/{object_name}?put"
+
+    def presigned_get_object(self, bucket_name, object_name, expires):
+        return f"{BENCH_ENDPOINT}/{bucket_name}/{object_name}?get"
+
+    def presigned_post_policy(self, policy) -> dict[str, str]:
+        return {"policy": "bench", "x-amz-signature": "bench"}
+
+
+def install_storage(root: str) -> None:
+    # Вызывается и в процессах пула разбора (initializer)
+    from src.app.storage import minio_client
+    minio_client.Minio = functools.partial(LocalS3, root)
+    minio_client.get_minio_client.cache_clear()
+
+
+def install_celery() -> list[tuple[int, str, int]]:
+    # Задачи выполняются на месте (eager). Outbox relay API-процесса
+    # ничего не отправляет, а копит сообщения в списке: разбор в
+    # потоке relay ушёл бы в чужой цикл событий с тем же пулом БД
+    from src.celery_app import celery_app
+    from src.app.files import outbox
+    celery_app.conf.update(
+        task_always_eager=True,
+        task_eager_propagates=True,
+        broker_url="memory://",
+        result_backend="cache+memory://")
+    deferred = []
+
+    def publish(messages):
+        deferred.extend(
+            (m.payload["file_id"], m.payload["content_type"],
+             m.payload["size"])
+            for m in messages if m.topic == outbox.EXTRACT_METADATA)
+
+    outbox._publish = publish
+    return deferred
+
+
+def install_extraction_pool(root: str) -> None:
+    # Тот же spawn-пул, что в extraction, но процессы пула тоже
+    # читают объекты из LocalS3
+    from src.app.config import settings
+    from src.app.files import extraction
+
+    @functools.lru_cache(maxsize=1)
+    def get_pool() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=settings.metadata_extract_processes
+            or os.cpu_count() or 1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=install_storage,
+            initargs=(root,))
+
+    extraction._get_process_pool = get_pool
@@ -0,0 +1,51 @@
+"""Files listing indexes
+
+Revision ID: 5d2c8e41a7b9
+Revises: cf98958d3137
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2c8e41a7b9'
+down_revision: Union[str, Sequence[str], None] = 'cf98958d3137'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ix_files_created_at_id": "(created_at, id)",
+    "ix_files_owner_created": "(owner_id, created_at, id)",
+    "ix_files_department_created": "(department, created_at, id)",
+    "ix_files_visibility_created": "(visibility, created_at, id)",
+    "ix_files_content_type_created": "(content_type, created_at, id)",
+    "ix_files_filename_prefix": "(filename varchar_pattern_ops)",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # На пустой базе таблицы создаст create_all вместе с индексами
+    if not sa.inspect(op.get_bind()).has_table("files"):
+        return
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                f"ON files {columns}")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_files_owner_id")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_files_department")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table("files"):
+        return
+    op.create_index("ix_files_owner_id", "files", ["owner_id"])
+    op.create_index("ix_files_department", "files", ["department"])
+    for name in INDEXES:
+        op.drop_index(name, table_name="files")
@@ -0,0 +1,99 @@
+"""Upload sessions
+
+Revision ID: 6b3e90f4d2a8
+Revises: a4d9c27e8b15
+Create Date: 2026-10-18 19:31:47.902115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b3e90f4d2a8'
+down_revision: Union[str, Sequence[str], None] = 'a4d9c27e8b15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+upload_status = postgresql.ENUM(
+    "ACTIVE", "COMPLETED", name="uploadstatus")
+upload_mode = postgresql.ENUM("MULTIPART", "DIRECT", name="uploadmode")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("files"):
+        return
+    if inspector.has_table("upload_sessions"):
+        return
+    bind = op.get_bind()
+    upload_status.create(bind, checkfirst=True)
+    upload_mode.create(bind, checkfirst=True)
+    op.create_table(
+        "upload_sessions",
+        sa.Column("id", sa.String(32), primary_key=True),
+        sa.Column(
+            "owner_id",
+            sa.Integer(),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False),
+        sa.Column("department", sa.String(100), nullable=False),
+        sa.Column("filename", sa.String(255), nullable=False),
+        sa.Column("content_type", sa.String(100), nullable=False),
+        sa.Column("size_bytes", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "visibility",
+            postgresql.ENUM(name="visibility", create_type=False),
+            nullable=False),
+        sa.Column("s3_key", sa.String(255), nullable=False, unique=True),
+        sa.Column(
+            "mode",
+            postgresql.ENUM(name="uploadmode", create_type=False),
+            nullable=False),
+        sa.Column("s3_upload_id", sa.String(255), nullable=True),
+        sa.Column("part_size", sa.BigInteger(), nullable=False),
+        sa.Column("part_count", sa.Integer(), nullable=False),
+        sa.Column(
+            "status",
+            postgresql.ENUM(name="uploadstatus", create_type=False),
+            nullable=False),
+        sa.Column(
+            "file_id",
+            sa.Integer(),
+            sa.ForeignKey("files.id", ondelete="SET NULL"),
+            nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        "ix_upload_sessions_owner_id", "upload_sessions", ["owner_id"])
+    op.create_index(
+        "ix_upload_sessions_status", "upload_sessions", ["status"])
+    op.create_index(
+        "ix_upload_sessions_updated_at", "upload_sessions", ["updated_at"])
+    op.create_table(
+        "upload_parts",
+        sa.Column(
+            "session_id",
+            sa.String(32),
+            sa.ForeignKey("upload_sessions.id", ondelete="CASCADE"),
+            primary_key=True),
+        sa.Column("part_number", sa.Integer(), primary_key=True),
+        sa.Column("etag", sa.String(255), nullable=False),
+        sa.Column("size_bytes", sa.BigInteger(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table("upload_sessions"):
+        return
+    op.drop_table("upload_parts")
+    op.drop_table("upload_sessions")
+    upload_mode.drop(bind, checkfirst=True)
+    upload_status.drop(bind, checkfirst=True)
@@ -0,0 +1,55 @@
+"""Content addressed blobs
+
+Revision ID: 9a41f3c07e2d
+Revises: 5d2c8e41a7b9
+Create Date: 2026-10-18 11:40:05.532871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a41f3c07e2d'
+down_revision: Union[str, Sequence[str], None] = '5d2c8e41a7b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("files"):
+        return
+    if not inspector.has_table("blobs"):
+        op.create_table(
+            "blobs",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("sha256", sa.String(64), nullable=False, unique=True),
+            sa.Column("s3_key", sa.String(255), nullable=False, unique=True),
+            sa.Column("size_bytes", sa.BigInteger(), nullable=False),
+            sa.Column("refcount", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+        )
+    op.add_column("files", sa.Column(
+        "blob_id",
+        sa.Integer(),
+        sa.ForeignKey("blobs.id", ondelete="SET NULL"),
+        nullable=True))
+    op.create_index("ix_files_blob_id", "files", ["blob_id"])
+    # Несколько файлов теперь могут указывать на один объект
+    op.drop_index("ix_files_s3_key", table_name="files")
+    op.create_index("ix_files_s3_key", "files", ["s3_key"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table("files"):
+        return
+    op.drop_index("ix_files_s3_key", table_name="files")
+    op.create_index("ix_files_s3_key", "files", ["s3_key"], unique=True)
+    op.drop_index("ix_files_blob_id", table_name="files")
+    op.drop_column("files", "blob_id")
+    op.drop_table("blobs")
@@ -0,0 +1,41 @@
+"""Download counter flush batches
+
+Revision ID: a4d9c27e8b15
+Revises: f2c7d18b4e06
+Create Date: 2026-10-18 19:04:12.530611
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d9c27e8b15'
+down_revision: Union[str, Sequence[str], None] = 'f2c7d18b4e06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("files"):
+        return
+    if inspector.has_table("download_flushes"):
+        return
+    op.create_table(
+        "download_flushes",
+        sa.Column("batch_id", sa.String(32), primary_key=True),
+        sa.Column("applied_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        "ix_download_flushes_applied_at", "download_flushes",
+        ["applied_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if sa.inspect(op.get_bind()).has_table("download_flushes"):
+        op.drop_table("download_flushes")
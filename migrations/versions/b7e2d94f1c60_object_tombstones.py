@@ -0,0 +1,41 @@
+"""Object tombstones
+
+Revision ID: b7e2d94f1c60
+Revises: 9a41f3c07e2d
+Create Date: 2026-10-18 12:25:41.208319
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2d94f1c60'
+down_revision: Union[str, Sequence[str], None] = '9a41f3c07e2d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("files"):
+        return
+    if inspector.has_table("object_tombstones"):
+        return
+    op.create_table(
+        "object_tombstones",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("s3_key", sa.String(255), nullable=False, unique=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("last_error", sa.String(255), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if sa.inspect(op.get_bind()).has_table("object_tombstones"):
+        op.drop_table("object_tombstones")
@@ -0,0 +1,40 @@
+"""Outbox
+
+Revision ID: c3f58a0e6d14
+Revises: b7e2d94f1c60
+Create Date: 2026-10-18 13:52:17.640982
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f58a0e6d14'
+down_revision: Union[str, Sequence[str], None] = 'b7e2d94f1c60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("files"):
+        return
+    if inspector.has_table("outbox"):
+        return
+    op.create_table(
+        "outbox",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("topic", sa.String(64), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if sa.inspect(op.get_bind()).has_table("outbox"):
+        op.drop_table("outbox")
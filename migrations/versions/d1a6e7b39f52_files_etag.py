@@ -0,0 +1,33 @@
+"""Files etag
+
+Revision ID: d1a6e7b39f52
+Revises: c3f58a0e6d14
+Create Date: 2026-10-18 15:08:33.415207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1a6e7b39f52'
+down_revision: Union[str, Sequence[str], None] = 'c3f58a0e6d14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table("files"):
+        return
+    op.add_column(
+        "files", sa.Column("etag", sa.String(255), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table("files"):
+        return
+    op.drop_column("files", "etag")
@@ -0,0 +1,45 @@
+"""File metadata search
+
+Revision ID: e5b09c2d7a31
+Revises: d1a6e7b39f52
+Create Date: 2026-10-18 16:21:49.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b09c2d7a31'
+down_revision: Union[str, Sequence[str], None] = 'd1a6e7b39f52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table("file_metadata"):
+        return
+    op.add_column(
+        "file_metadata", sa.Column("content", sa.Text(), nullable=True))
+    op.add_column(
+        "file_metadata",
+        sa.Column("search_vector", postgresql.TSVECTOR(), nullable=True))
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS "
+            "ix_file_metadata_search_vector "
+            "ON file_metadata USING gin (search_vector)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table("file_metadata"):
+        return
+    op.drop_index(
+        "ix_file_metadata_search_vector", table_name="file_metadata")
+    op.drop_column("file_metadata", "search_vector")
+    op.drop_column("file_metadata", "content")
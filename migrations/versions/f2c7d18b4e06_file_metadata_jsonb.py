@@ -0,0 +1,58 @@
+"""File metadata jsonb
+
+Revision ID: f2c7d18b4e06
+Revises: e5b09c2d7a31
+Create Date: 2026-10-18 17:03:12.557340
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c7d18b4e06'
+down_revision: Union[str, Sequence[str], None] = 'e5b09c2d7a31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ix_file_metadata_type": "((raw ->> 'type'))",
+    "ix_file_metadata_author": "(lower(raw ->> 'author'))",
+    "ix_file_metadata_pages": "(((raw ->> 'pages')::integer))",
+    "ix_file_metadata_created": "((raw ->> 'created'))",
+}
+
+# jsonb не принимает \u0000, на такой строке каст обрывает миграцию.
+# Экранированные обратные слеши прячем за chr(1): в тексте json
+# управляющих символов быть не может, а "\\u0000" - не NUL
+RAW_TO_JSONB = (
+    r"replace(replace(replace(raw::text, E'\\\\', chr(1)), "
+    r"E'\\u0000', ''), chr(1), E'\\\\')::jsonb")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table("file_metadata"):
+        return
+    # Переписывает таблицу под эксклюзивной блокировкой
+    op.execute(
+        "ALTER TABLE file_metadata "
+        f"ALTER COLUMN raw TYPE jsonb USING {RAW_TO_JSONB}")
+    with op.get_context().autocommit_block():
+        for name, expr in INDEXES.items():
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+                f"ON file_metadata {expr}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not sa.inspect(op.get_bind()).has_table("file_metadata"):
+        return
+    for name in INDEXES:
+        op.drop_index(name, table_name="file_metadata")
+    op.execute(
+        "ALTER TABLE file_metadata "
+        "ALTER COLUMN raw TYPE json USING raw::json")
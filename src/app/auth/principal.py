@@ -0,0 +1,96 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from redis.exceptions import RedisError
+from ..common.enums import Role
+from ..common.redis_client import get_redis
+from ..config import settings
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+REDIS_PREFIX = "filevault:principal:"
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    email: str
+    role: Role
+    department: str
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            role=user.role,
+            department=user.department)
+
+
+_local: OrderedDict[str, tuple[float, Principal]] = OrderedDict()
+
+
+def _local_get(email: str) -> Principal | None:
+    entry = _local.get(email)
+    if entry is None:
+        return None
+    expires_at, principal = entry
+    if expires_at < time.monotonic():
+        _local.pop(email, None)
+        return None
+    _local.move_to_end(email)
+    return principal
+
+
+def _local_set(email: str, principal: Principal) -> None:
+    _local[email] = (
+        time.monotonic() + settings.principal_cache_ttl, principal)
+    _local.move_to_end(email)
+    while len(_local) > settings.principal_cache_size:
+        _local.popitem(last=False)
+
+
+async def get_cached_principal(email: str) -> Principal | None:
+    if settings.principal_cache_backend != "redis":
+        return _local_get(email)
+    # Без локального слоя: иначе роль, снятая на одной реплике,
+    # жила бы на остальных ещё principal_cache_ttl
+    try:
+        raw = await get_redis().get(REDIS_PREFIX + email)
+    except RedisError as e:
+        logger.warning(f"Principal cache unavailable: {e}")
+        return None
+    if raw is None:
+        return None
+    data = json.loads(raw)
+    return Principal(
+        id=data["id"],
+        email=data["email"],
+        role=Role(data["role"]),
+        department=data["department"])
+
+
+async def cache_principal(principal: Principal) -> None:
+    if settings.principal_cache_backend != "redis":
+        _local_set(principal.email, principal)
+        return
+    try:
+        await get_redis().set(
+            REDIS_PREFIX + principal.email,
+            json.dumps(asdict(principal)),
+            ex=settings.principal_cache_redis_ttl)
+    except RedisError as e:
+        logger.warning(f"Principal cache unavailable: {e}")
+
+
+async def invalidate_principal(email: str) -> None:
+    _local.pop(email, None)
+    if settings.principal_cache_backend != "redis":
+        return
+    try:
+        await get_redis().delete(REDIS_PREFIX + email)
+    except RedisError as e:
+        logger.warning(f"Principal cache invalidation failed: {e}")
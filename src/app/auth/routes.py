@@ -4,7 +4,7 @@ from sqlalchemy import select
 from ..database import get_session
 from .schemas import LoginIn, Token, UserOut
 from .models import User
-from .security import verify_password, create_access_token
+from .security import verify_and_update_async, create_access_token
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -15,8 +15,16 @@ async def login(
         session: AsyncSession = Depends(get_session)):
     res = await session.execute(select(User).where(User.email == payload.email))
     user = res.scalar_one_or_none()
-    if not user or not verify_password(payload.password, user.hashed_password):
+    if not user:
         raise HTTPException(401, "Invalid credentials")
+    valid, new_hash = await verify_and_update_async(
+        payload.password, user.hashed_password)
+    if not valid:
+        raise HTTPException(401, "Invalid credentials")
+    if new_hash:
+        # Стоимость bcrypt поменялась: перехешируем прозрачно
+        user.hashed_password = new_hash
+        await session.commit()
     token = create_access_token(user.email)
     return Token(access_token=token)
 
@@ -1,8 +1,18 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 import jwt
+from fastapi import HTTPException
 from passlib.context import CryptContext
 from ..config import settings
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.bcrypt_rounds)
+
+_hashing = {"pending": 0}
 
 
 def hash_password(password: str) -> str:
@@ -13,6 +23,42 @@ def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
 
+@functools.lru_cache(maxsize=1)
+def _get_hash_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=settings.password_hash_workers,
+        thread_name_prefix="bcrypt")
+
+
+os.register_at_fork(after_in_child=_get_hash_executor.cache_clear)
+
+
+async def _run_hashing(fn, *args):
+    # bcrypt отпускает GIL, поэтому потоки реально параллельны;
+    # сверх лимита очереди сразу отвечаем 429, а не копим задержку
+    limit = settings.password_hash_workers + settings.password_hash_queue_limit
+    if _hashing["pending"] >= limit:
+        raise HTTPException(
+            429,
+            "Too many authentication requests",
+            headers={"Retry-After": "1"})
+    _hashing["pending"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hash_executor(), fn, *args)
+    finally:
+        _hashing["pending"] -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hashing(pwd_context.hash, password)
+
+
+async def verify_and_update_async(
+        plain: str, hashed: str) -> tuple[bool, str | None]:
+    return await _run_hashing(pwd_context.verify_and_update, plain, hashed)
+
+
 def create_access_token(subject: str) -> str:
     expire = datetime.now(timezone.utc) + \
         timedelta(minutes=settings.access_token_expire_minutes)
@@ -11,3 +11,13 @@ class Visibility(str, Enum):
     PRIVATE = "PRIVATE"
     DEPARTMENT = "DEPARTMENT"
     PUBLIC = "PUBLIC"
+
+
+class UploadStatus(str, Enum):
+    ACTIVE = "ACTIVE"
+    COMPLETED = "COMPLETED"
+
+
+class UploadMode(str, Enum):
+    MULTIPART = "MULTIPART"
+    DIRECT = "DIRECT"
@@ -0,0 +1,24 @@
+import asyncio
+import os
+from collections.abc import Coroutine
+
+_state = {"loop": None}
+
+
+def run_async(coro: Coroutine):
+    # Один цикл на процесс воркера вместо asyncio.run() на каждую задачу:
+    # соединения asyncpg привязаны к циклу, в котором созданы, и пул
+    # engine переживает задачу только если цикл тот же
+    loop = _state["loop"]
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        _state["loop"] = loop
+    return loop.run_until_complete(coro)
+
+
+def _reset_after_fork():
+    _state["loop"] = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
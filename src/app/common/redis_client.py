@@ -0,0 +1,23 @@
+import functools
+import os
+import redis
+import redis.asyncio as aioredis
+from ..config import settings
+
+
+@functools.lru_cache(maxsize=1)
+def get_redis() -> aioredis.Redis:
+    return aioredis.from_url(settings.redis_url)
+
+
+@functools.lru_cache(maxsize=1)
+def get_sync_redis() -> redis.Redis:
+    return redis.Redis.from_url(settings.redis_url)
+
+
+def _reset_after_fork():
+    get_redis.cache_clear()
+    get_sync_redis.cache_clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -16,6 +16,31 @@ class Settings(BaseSettings):
     pg_db: str = Field(default="filevault", alias="POSTGRES_DB")
     pg_user: str = Field(default="filevault", alias="POSTGRES_USER")
     pg_password: str = Field(default="filevault", alias="POSTGRES_PASSWORD")
+    db_echo: bool = Field(default=False, alias="DB_ECHO")
+    db_pool_size: int = Field(default=10, alias="DB_POOL_SIZE")
+    db_max_overflow: int = Field(default=20, alias="DB_MAX_OVERFLOW")
+    db_pool_timeout: float = Field(default=30.0, alias="DB_POOL_TIMEOUT")
+    db_pool_recycle: int = Field(default=1800, alias="DB_POOL_RECYCLE")
+    db_pool_pre_ping: bool = Field(default=True, alias="DB_POOL_PRE_PING")
+    db_statement_cache_size: int = Field(
+        default=100,
+        alias="DB_STATEMENT_CACHE_SIZE")
+    # PgBouncer в режиме transaction: без кэша подготовленных
+    # выражений и с уникальными именами для них
+    db_pgbouncer: bool = Field(default=False, alias="DB_PGBOUNCER")
+    # Реплика для чтения; без хоста всё читается с основной базы
+    pg_replica_host: str | None = Field(
+        default=None,
+        alias="POSTGRES_REPLICA_HOST")
+    pg_replica_port: int | None = Field(
+        default=None,
+        alias="POSTGRES_REPLICA_PORT")
+    db_replica_max_lag: float = Field(
+        default=5.0,
+        alias="DB_REPLICA_MAX_LAG")
+    db_replica_check_interval: float = Field(
+        default=2.0,
+        alias="DB_REPLICA_CHECK_INTERVAL")
 
     # Redis
     redis_url: str = Field(default="redis://redis:6379/0", alias="REDIS_URL")
@@ -32,10 +57,200 @@ class Settings(BaseSettings):
         default="minioadmin",
         alias="MINIO_SECRET_KEY")
     minio_secure: bool = Field(default=False, alias="MINIO_SECURE")
+    minio_region: str = Field(default="us-east-1", alias="MINIO_REGION")
+    minio_pool_size: int = Field(default=32, alias="MINIO_POOL_SIZE")
+    minio_connect_timeout: float = Field(
+        default=5.0,
+        alias="MINIO_CONNECT_TIMEOUT")
+    minio_read_timeout: float = Field(
+        default=60.0,
+        alias="MINIO_READ_TIMEOUT")
+    minio_max_retries: int = Field(default=3, alias="MINIO_MAX_RETRIES")
+    storage_max_workers: int = Field(
+        default=16,
+        alias="STORAGE_MAX_WORKERS")
+    # Отдельные потоки под передачу загрузок целиком: медленные клиенты
+    # не занимают потоки коротких вызовов (stat, presign, GC, чтения)
+    storage_transfer_workers: int = Field(
+        default=16,
+        alias="STORAGE_TRANSFER_WORKERS")
+
+    # Listing
+    list_default_page_size: int = Field(
+        default=50,
+        alias="LIST_DEFAULT_PAGE_SIZE")
+    list_max_page_size: int = Field(
+        default=200,
+        alias="LIST_MAX_PAGE_SIZE")
+    export_batch_size: int = Field(
+        default=1000,
+        alias="EXPORT_BATCH_SIZE")
+
+    # Metadata extraction
+    metadata_block_size: int = Field(
+        default=64 * 1024,
+        alias="METADATA_BLOCK_SIZE")
+    metadata_cache_blocks: int = Field(
+        default=64,
+        alias="METADATA_CACHE_BLOCKS")
+    # 0 - по числу ядер; в дочерних процессах celery prefork пул
+    # процессов недоступен, воркер метаданных запускается с --pool=solo
+    metadata_extract_processes: int = Field(
+        default=0,
+        alias="METADATA_EXTRACT_PROCESSES")
+    metadata_batch_size: int = Field(
+        default=100,
+        alias="METADATA_BATCH_SIZE")
+    # Быстрая очередь - PDF до этого размера, остальное (конвертация
+    # офисных документов, большие файлы) - в медленную
+    metadata_slow_size: int = Field(
+        default=20 * 1024 * 1024,
+        alias="METADATA_SLOW_SIZE")
+    metadata_fast_rate_limit: str | None = Field(
+        default=None,
+        alias="METADATA_FAST_RATE_LIMIT")
+    metadata_slow_rate_limit: str | None = Field(
+        default="60/m",
+        alias="METADATA_SLOW_RATE_LIMIT")
+    # Таймаут на один файл и общий лимит на пакет
+    metadata_fast_file_timeout: float = Field(
+        default=30.0,
+        alias="METADATA_FAST_FILE_TIMEOUT")
+    metadata_slow_file_timeout: float = Field(
+        default=180.0,
+        alias="METADATA_SLOW_FILE_TIMEOUT")
+    metadata_fast_time_limit: int = Field(
+        default=600,
+        alias="METADATA_FAST_TIME_LIMIT")
+    metadata_slow_time_limit: int = Field(
+        default=3600,
+        alias="METADATA_SLOW_TIME_LIMIT")
+    # После стольких падений файл уходит в очередь metadata_dead
+    metadata_max_attempts: int = Field(
+        default=3,
+        alias="METADATA_MAX_ATTEMPTS")
+
+    # LibreOffice для .doc: пул тёплых unoserver на каждый процесс
+    # воркера. По умолчанию выключен (0, libreoffice на каждый файл):
+    # нужен образ с LibreOffice и unoserver (poetry install --with office)
+    office_converter_pool_size: int = Field(
+        default=0,
+        alias="OFFICE_CONVERTER_POOL_SIZE")
+    office_converter_max_jobs: int = Field(
+        default=200,
+        alias="OFFICE_CONVERTER_MAX_JOBS")
+    office_converter_start_timeout: float = Field(
+        default=30.0,
+        alias="OFFICE_CONVERTER_START_TIMEOUT")
+    office_converter_queue_timeout: float = Field(
+        default=120.0,
+        alias="OFFICE_CONVERTER_QUEUE_TIMEOUT")
+    office_convert_timeout: float = Field(
+        default=60.0,
+        alias="OFFICE_CONVERT_TIMEOUT")
+    unoserver_bin: str = Field(default="unoserver", alias="UNOSERVER_BIN")
+
+    # Health
+    health_probe_interval: float = Field(
+        default=10.0,
+        alias="HEALTH_PROBE_INTERVAL")
+
+    # Кэш ответов о файлах
+    file_cache_ttl: int = Field(default=300, alias="FILE_CACHE_TTL")
+
+    # Полнотекстовый поиск; смена конфигурации требует переиндексации
+    search_text_max_chars: int = Field(
+        default=100_000,
+        alias="SEARCH_TEXT_MAX_CHARS")
+    # Текст PDF берём не дальше стольких страниц и скачанных на него
+    # байт: остальные страницы в поиск не попадают (0 - без предела)
+    search_text_max_pages: int = Field(
+        default=50,
+        alias="SEARCH_TEXT_MAX_PAGES")
+    search_text_max_bytes: int = Field(
+        default=4 * 1024 * 1024,
+        alias="SEARCH_TEXT_MAX_BYTES")
+    search_config: str = Field(default="simple", alias="SEARCH_CONFIG")
+    search_max_offset: int = Field(default=1000, alias="SEARCH_MAX_OFFSET")
+
+    # Downloads
+    download_chunk_size: int = Field(
+        default=256 * 1024,
+        alias="DOWNLOAD_CHUNK_SIZE")
+    downloads_flush_interval: float = Field(
+        default=10.0,
+        alias="DOWNLOADS_FLUSH_INTERVAL")
+
+    # Uploads
+    upload_part_size: int = Field(
+        default=8 * 1024 * 1024,
+        alias="UPLOAD_PART_SIZE")
+    upload_session_ttl_hours: int = Field(
+        default=24,
+        alias="UPLOAD_SESSION_TTL_HOURS")
+    direct_upload_expires_seconds: int = Field(
+        default=900,
+        alias="DIRECT_UPLOAD_EXPIRES_SECONDS")
+
+    # Outbox фоновых задач
+    outbox_batch_size: int = Field(default=500, alias="OUTBOX_BATCH_SIZE")
+    outbox_poll_interval: float = Field(
+        default=1.0,
+        alias="OUTBOX_POLL_INTERVAL")
+
+    # Удаление объектов из хранилища
+    gc_batch_size: int = Field(default=1000, alias="GC_BATCH_SIZE")
+    gc_reap_interval: float = Field(
+        default=60.0,
+        alias="GC_REAP_INTERVAL")
+    # После стольких неудачных удалений надгробие больше не берётся в
+    # работу и остаётся в таблице для разбора вручную
+    gc_max_attempts: int = Field(default=10, alias="GC_MAX_ATTEMPTS")
+    gc_reconcile_interval: float = Field(
+        default=86400.0,
+        alias="GC_RECONCILE_INTERVAL")
+    # Объекты моложе этого не считаются сиротами: загрузка могла
+    # ещё не закоммитить свою строку
+    gc_orphan_grace_hours: int = Field(
+        default=24,
+        alias="GC_ORPHAN_GRACE_HOURS")
+
+    # Метрики Prometheus. При нескольких процессах (uvicorn --workers,
+    # celery prefork) нужен PROMETHEUS_MULTIPROC_DIR, очищаемый при старте
+    metrics_loop_lag_interval: float = Field(
+        default=0.5,
+        alias="METRICS_LOOP_LAG_INTERVAL")
+    # Порт /metrics воркера celery; без него воркер метрики не отдаёт
+    metrics_worker_port: int | None = Field(
+        default=None,
+        alias="METRICS_WORKER_PORT")
 
     # Auth
     jwt_algorithm: str = "HS256"
     refresh_token_expire_days: int = 30
+    bcrypt_rounds: int = Field(default=12, alias="BCRYPT_ROUNDS")
+    password_hash_workers: int = Field(
+        default=4,
+        alias="PASSWORD_HASH_WORKERS")
+    password_hash_queue_limit: int = Field(
+        default=32,
+        alias="PASSWORD_HASH_QUEUE_LIMIT")
+    # memory: кэш только в процессе, изменения ролей видны другим
+    # репликам через principal_cache_ttl; redis: общий кэш без
+    # локального слоя, запрос в Redis на каждый вызов, инвалидация
+    # видна всем репликам сразу
+    principal_cache_backend: str = Field(
+        default="memory",
+        alias="PRINCIPAL_CACHE_BACKEND")
+    principal_cache_ttl: float = Field(
+        default=30.0,
+        alias="PRINCIPAL_CACHE_TTL")
+    principal_cache_redis_ttl: int = Field(
+        default=600,
+        alias="PRINCIPAL_CACHE_REDIS_TTL")
+    principal_cache_size: int = Field(
+        default=10000,
+        alias="PRINCIPAL_CACHE_SIZE")
 
     # Bootstrap admin
     bootstrap_admin_email: str = Field(
@@ -59,3 +274,13 @@ def sync_db_url() -> str:
         f"postgresql+asyncpg://{settings.pg_user}:{settings.pg_password}"
         f"@{settings.pg_host}:{settings.pg_port}/{settings.pg_db}"
     )
+
+
+def replica_db_url() -> str | None:
+    if not settings.pg_replica_host:
+        return None
+    port = settings.pg_replica_port or settings.pg_port
+    return (
+        f"postgresql+asyncpg://{settings.pg_user}:{settings.pg_password}"
+        f"@{settings.pg_replica_host}:{port}/{settings.pg_db}"
+    )
@@ -1,9 +1,11 @@
+import jwt
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from .auth.models import User
-from .database import get_session
+from .auth.principal import Principal, get_cached_principal, cache_principal
+from .auth.security import decode_token
+from .database import SessionLocal
 from .common.enums import Role
 
 
@@ -21,19 +23,32 @@ class JWTBearer(HTTPBearer):
 jwt_bearer = JWTBearer()
 
 
-async def get_current_user(
-        session: AsyncSession = Depends(get_session)) -> User:
-    email = "admin@example.com"
-    res = await session.execute(select(User).where(User.email == email))
-    user = res.scalar_one_or_none()
+async def get_current_user(token: str = Depends(jwt_bearer)) -> Principal:
+    try:
+        email = decode_token(token).get("sub")
+    except jwt.PyJWTError:
+        email = None
+    if not email:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token")
+    principal = await get_cached_principal(email)
+    if principal is not None:
+        return principal
+    async with SessionLocal() as session:
+        res = await session.execute(select(User).where(User.email == email))
+        user = res.scalar_one_or_none()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found")
+    principal = Principal.from_user(user)
+    await cache_principal(principal)
+    return principal
 
 
 def require_role(*roles: Role):
-    async def checker(user: User = Depends(get_current_user)):
+    async def checker(user: Principal = Depends(get_current_user)):
         if user.role not in roles:
             raise HTTPException(status_code=403, detail="Insufficient role")
         return user
@@ -0,0 +1,99 @@
+from collections import Counter
+from sqlalchemy import Integer, bindparam, select, delete, text, update, func
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from .models import Blob, File, FileMetadata
+
+
+async def claim_blob(
+        session: AsyncSession,
+        sha256: str,
+        key: str,
+        size: int) -> tuple[int, str]:
+    # Либо новый blob с только что загруженным объектом, либо +1 к
+    # существующему; строка блокируется до конца транзакции, поэтому
+    # параллельное удаление не снесёт объект из-под нас
+    stmt = pg_insert(Blob).values(
+        sha256=sha256, s3_key=key, size_bytes=size, refcount=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Blob.sha256],
+        set_={"refcount": Blob.refcount + 1})
+    res = await session.execute(stmt.returning(Blob.id, Blob.s3_key))
+    blob_id, blob_key = res.one()
+    return blob_id, blob_key
+
+
+async def release_blob(session: AsyncSession, blob_id: int) -> str | None:
+    res = await session.execute(
+        update(Blob)
+        .where(Blob.id == blob_id)
+        .values(refcount=Blob.refcount - 1)
+        .returning(Blob.refcount, Blob.s3_key))
+    row = res.one_or_none()
+    if row is None or row.refcount > 0:
+        return None
+    await session.execute(delete(Blob).where(Blob.id == blob_id))
+    return row.s3_key
+
+
+_release_counts = text(
+    "UPDATE blobs SET refcount = blobs.refcount - d.n "
+    "FROM unnest(:ids, :counts) AS d(id, n) "
+    "WHERE blobs.id = d.id"
+).bindparams(
+    bindparam("ids", type_=ARRAY(Integer)),
+    bindparam("counts", type_=ARRAY(Integer)))
+
+
+async def release_blobs(
+        session: AsyncSession,
+        blob_ids: list[int]) -> list[str]:
+    # То же, что release_blob, для пачки файлов за два запроса
+    if not blob_ids:
+        return []
+    counts = Counter(blob_ids)
+    await session.execute(_release_counts, {
+        "ids": list(counts), "counts": list(counts.values())})
+    res = await session.execute(
+        delete(Blob)
+        .where(Blob.id.in_(list(counts)), Blob.refcount <= 0)
+        .returning(Blob.s3_key))
+    return list(res.scalars().all())
+
+
+async def sibling_metadata(
+        session: AsyncSession,
+        blob_id: int,
+        file_id: int) -> tuple[dict, str] | None:
+    res = await session.execute(
+        select(FileMetadata.raw, FileMetadata.content)
+        .join(File, File.id == FileMetadata.file_id)
+        .where(
+            File.blob_id == blob_id,
+            File.id != file_id,
+            FileMetadata.content.isnot(None))
+        .limit(1))
+    row = res.one_or_none()
+    return tuple(row) if row else None
+
+
+async def blobs_metadata(
+        session: AsyncSession,
+        blob_ids: list[int],
+        exclude_file_ids: list[int]) -> dict[int, tuple[dict, str]]:
+    if not blob_ids:
+        return {}
+    # По одной записи на blob, даже если на него ссылаются тысячи файлов
+    first = (
+        select(func.min(FileMetadata.id))
+        .join(File, File.id == FileMetadata.file_id)
+        .where(
+            File.blob_id.in_(blob_ids),
+            File.id.notin_(exclude_file_ids),
+            FileMetadata.content.isnot(None))
+        .group_by(File.blob_id))
+    res = await session.execute(
+        select(File.blob_id, FileMetadata.raw, FileMetadata.content)
+        .join(File, File.id == FileMetadata.file_id)
+        .where(FileMetadata.id.in_(first)))
+    return {blob_id: (raw, content) for blob_id, raw, content in res.all()}
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import math
+from dataclasses import dataclass
+from redis.exceptions import RedisError, WatchError
+from sqlalchemy import select
+from ..common.enums import Visibility
+from ..common.redis_client import get_redis
+from ..config import settings
+from ..database import SessionLocal, read_session, replica_configured
+from .models import File, FileMetadata
+from .schemas import FileOut, FileMetaOut
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "filevault:file:"
+# Поколение должно пережить любой промах, иначе после истечения INCR
+# начнёт счёт заново и старое значение может совпасть
+GENERATION_TTL = 24 * 3600
+
+
+@dataclass(frozen=True)
+class CachedFile:
+    # Поля для проверки доступа и готовые JSON-ответы
+    owner_id: int
+    department: str
+    visibility: Visibility
+    info: bytes
+    meta: bytes
+
+    @classmethod
+    def from_redis(cls, entry: dict[bytes, bytes]) -> "CachedFile":
+        return cls(
+            owner_id=int(entry[b"owner_id"]),
+            department=entry[b"department"].decode(),
+            visibility=Visibility(entry[b"visibility"].decode()),
+            info=entry[b"info"],
+            meta=entry[b"meta"])
+
+    def to_redis(self) -> dict[str, bytes]:
+        return {
+            "owner_id": str(self.owner_id).encode(),
+            "department": self.department.encode(),
+            "visibility": self.visibility.value.encode(),
+            "info": self.info,
+            "meta": self.meta}
+
+
+def file_cache_key(file_id: int) -> str:
+    return f"{PREFIX}{file_id}"
+
+
+def dirty_key(file_id: int) -> str:
+    # Файл недавно менялся: реплика может его ещё не видеть
+    return f"{PREFIX}{file_id}:dirty"
+
+
+def generation_key(file_id: int) -> str:
+    # Растёт при каждой инвалидации: промах, начатый до неё, не
+    # должен записать в кэш то, что прочитал
+    return f"{PREFIX}{file_id}:gen"
+
+
+def queue_invalidation(pipe, file_ids: list[int]) -> None:
+    # Команды для pipeline, синхронного или асинхронного
+    pipe.delete(*map(file_cache_key, file_ids))
+    for file_id in file_ids:
+        pipe.incr(generation_key(file_id))
+        pipe.expire(generation_key(file_id), GENERATION_TTL)
+    _queue_dirty(pipe, file_ids)
+
+
+def _queue_dirty(pipe, file_ids: list[int]) -> None:
+    if not replica_configured():
+        return
+    # Пока метка жива, промах читается с основной базы и не кэширует
+    # устаревшую строку с реплики. Отставание в пределах max_lag, но
+    # годность реплики перепроверяется раз в check_interval
+    ttl = math.ceil(
+        settings.db_replica_max_lag + settings.db_replica_check_interval)
+    for file_id in file_ids:
+        pipe.set(dirty_key(file_id), 1, ex=ttl)
+
+
+_inflight: dict[int, asyncio.Task] = {}
+
+
+async def _store(
+        file_id: int,
+        generation: bytes | None,
+        cached: CachedFile) -> None:
+    # Пишем, только если с чтения поколения никто не инвалидировал файл
+    key = generation_key(file_id)
+    try:
+        async with get_redis().pipeline(transaction=True) as pipe:
+            await pipe.watch(key)
+            if await pipe.get(key) != generation:
+                return
+            pipe.multi()
+            pipe.hset(file_cache_key(file_id), mapping=cached.to_redis())
+            pipe.expire(file_cache_key(file_id), settings.file_cache_ttl)
+            await pipe.execute()
+    except WatchError:
+        pass
+    except RedisError as e:
+        logger.warning(f"File cache unavailable: {e}")
+
+
+async def _load(
+        file_id: int,
+        primary: bool,
+        generation: bytes | None) -> CachedFile | None:
+    async with (SessionLocal() if primary else read_session()) as session:
+        res = await session.execute(
+            select(File, FileMetadata.raw)
+            .outerjoin(FileMetadata, FileMetadata.file_id == File.id)
+            .where(File.id == file_id))
+        row = res.one_or_none()
+    if row is None:
+        return None
+    rec, raw = row
+    cached = CachedFile(
+        owner_id=rec.owner_id,
+        department=rec.department,
+        visibility=rec.visibility,
+        info=FileOut.model_validate(rec).model_dump_json().encode(),
+        meta=FileMetaOut(file_id=rec.id, raw=raw or {})
+        .model_dump_json().encode())
+    await _store(file_id, generation, cached)
+    return cached
+
+
+async def get_cached_file(file_id: int) -> CachedFile | None:
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.hgetall(file_cache_key(file_id))
+            pipe.exists(dirty_key(file_id))
+            pipe.get(generation_key(file_id))
+            entry, dirty, generation = await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"File cache unavailable: {e}")
+        # Без Redis не знаем, менялся ли файл: читаем с основной базы
+        entry, dirty, generation = None, True, None
+    if entry:
+        return CachedFile.from_redis(entry)
+    # Одновременные промахи по одному файлу ждут один запрос в БД
+    task = _inflight.get(file_id)
+    if task is None:
+        task = asyncio.create_task(
+            _load(file_id, primary=bool(dirty), generation=generation))
+        _inflight[file_id] = task
+        task.add_done_callback(lambda _: _inflight.pop(file_id, None))
+    return await asyncio.shield(task)
+
+
+async def invalidate_files(file_ids: list[int]) -> None:
+    if not file_ids:
+        return
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            queue_invalidation(pipe, file_ids)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"File cache invalidation failed: {e}")
+
+
+async def mark_created(file_ids: list[int]) -> None:
+    # Нового файла на реплике может ещё не быть: GET сразу после
+    # загрузки должен идти в основную базу, а не отвечать 404
+    if not file_ids or not replica_configured():
+        return
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            _queue_dirty(pipe, file_ids)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"File cache unavailable: {e}")
@@ -0,0 +1,138 @@
+import logging
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import Integer, bindparam, delete, select, text, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from redis.exceptions import RedisError, ResponseError
+from ..common.redis_client import get_redis, get_sync_redis
+from ..database import SessionLocal
+from .cache import queue_invalidation
+from .models import DownloadFlush, File
+from .schemas import FileOut
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "filevault:downloads"
+FLUSHING_KEY = "filevault:downloads:flushing"
+FLUSH_LOCK_KEY = "filevault:downloads:lock"
+# Поле с id сброса в самом хэше: переезжает вместе со счётчиками
+BATCH_FIELD = "batch"
+# Столько помним применённые сбросы; упавший сброс повторяется
+# следующим запуском, то есть намного раньше
+FLUSH_HISTORY = timedelta(days=1)
+
+_apply_counts = text(
+    "UPDATE files SET downloads = files.downloads + d.n "
+    "FROM unnest(:ids, :counts) AS d(id, n) "
+    "WHERE files.id = d.id"
+).bindparams(
+    bindparam("ids", type_=ARRAY(Integer)),
+    bindparam("counts", type_=ARRAY(Integer)))
+
+
+async def record_download(session: AsyncSession, file_id: int) -> None:
+    try:
+        await get_redis().hincrby(PENDING_KEY, str(file_id), 1)
+    except RedisError as e:
+        # Без Redis считаем по-старому, прямо в строке файла
+        logger.warning(f"Download counter fallback to DB: {e}")
+        await session.execute(
+            update(File)
+            .where(File.id == file_id)
+            .values(downloads=File.downloads + 1))
+        await session.commit()
+
+
+async def pending_downloads(file_ids: list[int]) -> dict[int, int]:
+    if not file_ids:
+        return {}
+    fields = [str(i) for i in file_ids]
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.hmget(PENDING_KEY, fields)
+            pipe.hmget(FLUSHING_KEY, [BATCH_FIELD, *fields])
+            pending, [batch, *flushing] = await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Pending downloads unavailable: {e}")
+        return {}
+    if batch and any(flushing):
+        # Сброс уже в базе, но хэш ещё не удалён: не считаем дважды
+        async with SessionLocal() as session:
+            if await _batch_applied(session, batch.decode()):
+                flushing = [None] * len(fields)
+    return {
+        file_id: int(a or 0) + int(b or 0)
+        for file_id, a, b in zip(file_ids, pending, flushing)}
+
+
+async def with_pending_downloads(recs: list[File]) -> list[FileOut]:
+    pending = await pending_downloads([r.id for r in recs])
+    return [
+        FileOut.model_validate(r).model_copy(
+            update={"downloads": r.downloads + pending.get(r.id, 0)})
+        for r in recs]
+
+
+async def _batch_applied(session: AsyncSession, batch: str) -> bool:
+    res = await session.execute(
+        select(DownloadFlush.batch_id).where(DownloadFlush.batch_id == batch))
+    return res.scalar_one_or_none() is not None
+
+
+async def apply_batch(
+        session: AsyncSession,
+        batch: str,
+        counts: dict[int, int]) -> bool:
+    # Id сброса пишется в той же транзакции, что и счётчики: повтор
+    # после сбоя между commit и удалением хэша ничего не добавит
+    res = await session.execute(
+        pg_insert(DownloadFlush)
+        .values(batch_id=batch, applied_at=datetime.utcnow())
+        .on_conflict_do_nothing()
+        .returning(DownloadFlush.batch_id))
+    if res.scalar_one_or_none() is None:
+        await session.rollback()
+        return False
+    await session.execute(_apply_counts, {
+        "ids": list(counts), "counts": list(counts.values())})
+    await session.execute(delete(DownloadFlush).where(
+        DownloadFlush.applied_at < datetime.utcnow() - FLUSH_HISTORY))
+    await session.commit()
+    return True
+
+
+async def flush_downloads(session: AsyncSession) -> int:
+    r = get_sync_redis()
+    lock = r.lock(FLUSH_LOCK_KEY, timeout=300)
+    if not lock.acquire(blocking=False):
+        return 0
+    try:
+        # Остаток прошлого неудачного сброса обрабатываем первым, с
+        # его прежним id
+        if not r.exists(FLUSHING_KEY):
+            if not r.exists(PENDING_KEY):
+                return 0
+            r.hset(PENDING_KEY, BATCH_FIELD, uuid.uuid4().hex)
+            try:
+                r.rename(PENDING_KEY, FLUSHING_KEY)
+            except ResponseError:
+                return 0
+        entry = r.hgetall(FLUSHING_KEY)
+        batch = entry.pop(BATCH_FIELD.encode(), b"").decode()
+        if not batch:
+            # Хэш, переименованный до появления id сброса
+            batch = uuid.uuid4().hex
+            r.hset(FLUSHING_KEY, BATCH_FIELD, batch)
+        counts = {int(k): int(v) for k, v in entry.items()}
+        if counts and not await apply_batch(session, batch, counts):
+            logger.warning(f"Download batch {batch} already applied")
+        with r.pipeline(transaction=True) as pipe:
+            # В кэше лежит старое значение downloads из строки
+            if counts:
+                queue_invalidation(pipe, list(counts))
+            pipe.delete(FLUSHING_KEY)
+            pipe.execute()
+        return len(counts)
+    finally:
+        lock.release()
@@ -0,0 +1,76 @@
+import csv
+import io
+import json
+from collections.abc import AsyncIterator
+from sqlalchemy import select
+from ..auth.principal import Principal
+from ..config import settings
+from ..database import read_session
+from .models import File, FileMetadata
+from .schemas import FileFilters
+from .service import visible_to, apply_file_filters
+
+EXPORT_COLUMNS = [
+    "id", "filename", "content_type", "size_bytes", "visibility",
+    "department", "owner_id", "created_at", "downloads", "metadata"]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _row(f: File, raw: dict | None) -> dict:
+    return {
+        "id": f.id,
+        "filename": f.filename,
+        "content_type": f.content_type,
+        "size_bytes": f.size_bytes,
+        "visibility": f.visibility.value,
+        "department": f.department,
+        "owner_id": f.owner_id,
+        "created_at": f.created_at.isoformat() if f.created_at else None,
+        "downloads": f.downloads,
+        "metadata": raw or {},
+    }
+
+
+def _ndjson_chunk(rows: list[dict]) -> bytes:
+    return "".join(
+        json.dumps(r, ensure_ascii=False, default=str) + "\n"
+        for r in rows).encode()
+
+
+def _csv_chunk(rows: list[dict], header: bool = False) -> bytes:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for r in rows:
+        r["metadata"] = json.dumps(
+            r["metadata"], ensure_ascii=False, default=str)
+        writer.writerow([r[c] for c in EXPORT_COLUMNS])
+    return buf.getvalue().encode()
+
+
+async def export_files(
+        user: Principal,
+        filters: FileFilters,
+        fmt: str) -> AsyncIterator[bytes]:
+    q = apply_file_filters(
+        select(File, FileMetadata.raw)
+        .outerjoin(FileMetadata, FileMetadata.file_id == File.id)
+        .where(visible_to(user)),
+        filters).order_by(File.id).execution_options(
+            yield_per=settings.export_batch_size)
+    if fmt == "csv":
+        yield _csv_chunk([], header=True)
+    # Своя сессия: ответ стримится уже после выхода из зависимостей
+    async with read_session() as session:
+        result = await session.stream(q)
+        async for partition in result.partitions():
+            rows = [_row(f, raw) for f, raw in partition]
+            if fmt == "csv":
+                yield _csv_chunk(rows)
+            else:
+                yield _ndjson_chunk(rows)
@@ -0,0 +1,145 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from redis.exceptions import RedisError
+from .utils.metadata_extractors import extract_pdf, extract_office
+from ..common.redis_client import get_redis
+from ..storage.ranged_reader import open_object
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+ATTEMPTS_PREFIX = "filevault:extract:attempts:"
+# Свой срок у каждого файла: общий хэш продлевался при каждом разборе
+# и под постоянной нагрузкой не истекал никогда
+ATTEMPTS_TTL = 86400
+
+OFFICE_TYPES = {
+    "application/msword",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+
+def is_slow(content_type: str, size: int) -> bool:
+    return content_type in OFFICE_TYPES or size > settings.metadata_slow_size
+
+
+def _timed_out(signum, frame):
+    raise TimeoutError("Metadata extraction timed out")
+
+
+def _extract(
+        key: str,
+        size: int,
+        content_type: str,
+        filename: str) -> tuple[dict, str]:
+    stream = open_object(key, size)
+    limit = settings.search_text_max_chars
+    if content_type == "application/pdf":
+        return extract_pdf(
+            stream, limit,
+            max_pages=settings.search_text_max_pages,
+            max_bytes=settings.search_text_max_bytes)
+    elif content_type in OFFICE_TYPES:
+        return extract_office(stream, filename, limit)
+    return {"type": "unknown"}, ""
+
+
+def extract_object(
+        key: str,
+        size: int,
+        content_type: str,
+        filename: str,
+        timeout: float | None = None) -> tuple[dict, str]:
+    # В процессе пула задача идёт в главном потоке, и зависший парсер
+    # можно прервать таймером; в потоке-запасном так нельзя
+    in_main = threading.current_thread() is threading.main_thread()
+    if not timeout or not in_main:
+        return _extract(key, size, content_type, filename)
+    previous = signal.signal(signal.SIGALRM, _timed_out)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return _extract(key, size, content_type, filename)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_process_pool() -> ProcessPoolExecutor | None:
+    if multiprocessing.current_process().daemon:
+        # Демоническим процессам нельзя заводить детей
+        return None
+    workers = settings.metadata_extract_processes or os.cpu_count() or 1
+    # spawn: родитель уже держит потоки и цикл событий
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"))
+
+
+os.register_at_fork(after_in_child=_get_process_pool.cache_clear)
+
+
+async def run_extraction(
+        key: str,
+        size: int,
+        content_type: str,
+        filename: str,
+        timeout: float | None = None) -> tuple[dict, str]:
+    loop = asyncio.get_running_loop()
+    pool = _get_process_pool()
+    try:
+        return await loop.run_in_executor(
+            pool, extract_object, key, size, content_type, filename, timeout)
+    except BrokenProcessPool:
+        # Процесс пула упал на файле: следующий пакет получит новый пул
+        _get_process_pool.cache_clear()
+        pool.shutdown(wait=False)
+        raise
+
+
+def attempts_key(file_id: int) -> str:
+    return f"{ATTEMPTS_PREFIX}{file_id}"
+
+
+async def begin_attempts(file_ids: list[int]) -> dict[int, int]:
+    # Счётчик растёт до разбора: если воркер умрёт на файле, повторная
+    # доставка увидит это и не даст файлу ронять воркер бесконечно
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for file_id in file_ids:
+                pipe.incr(attempts_key(file_id))
+                pipe.expire(attempts_key(file_id), ATTEMPTS_TTL)
+            counts = (await pipe.execute())[::2]
+    except RedisError as e:
+        logger.warning(f"Extraction attempts are not tracked: {e}")
+        return {file_id: 1 for file_id in file_ids}
+    return dict(zip(file_ids, counts))
+
+
+async def forget_attempts(file_ids: list[int]) -> None:
+    # Файл отложен, а не разобран: попытка не засчитывается
+    if not file_ids:
+        return
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            for file_id in file_ids:
+                pipe.decr(attempts_key(file_id))
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Failed to update extraction attempts: {e}")
+
+
+async def clear_attempts(file_ids: list[int]) -> None:
+    if not file_ids:
+        return
+    try:
+        await get_redis().delete(*map(attempts_key, file_ids))
+    except RedisError as e:
+        logger.warning(f"Failed to clear extraction attempts: {e}")
@@ -0,0 +1,126 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from sqlalchemy import select, delete, update, union
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from .models import Blob, File, ObjectTombstone, UploadSession
+from ..common.enums import UploadStatus
+from ..storage.minio_client import remove_objects, list_objects, run_blocking
+from ..config import settings
+from ..metrics import GC_ABANDONED
+
+logger = logging.getLogger(__name__)
+
+# Лимит S3 DeleteObjects
+MAX_DELETE_KEYS = 1000
+
+
+async def add_tombstones(session: AsyncSession, keys: list[str]) -> None:
+    # Пишется в транзакции удаления строки: объект удалит reaper
+    keys = [k for k in keys if k]
+    if not keys:
+        return
+    await session.execute(
+        pg_insert(ObjectTombstone)
+        .values([{"s3_key": k} for k in keys])
+        .on_conflict_do_nothing(index_elements=[ObjectTombstone.s3_key]))
+
+
+async def _referenced_keys(
+        session: AsyncSession,
+        keys: list[str]) -> set[str]:
+    # Завершённая сессия живёт ещё сутки после finalize, но объект
+    # уже принадлежит файлу: ссылкой считаем только ACTIVE
+    res = await session.execute(union(
+        select(File.s3_key).where(File.s3_key.in_(keys)),
+        select(Blob.s3_key).where(Blob.s3_key.in_(keys)),
+        select(UploadSession.s3_key).where(
+            UploadSession.s3_key.in_(keys),
+            UploadSession.status == UploadStatus.ACTIVE)))
+    return set(res.scalars().all())
+
+
+async def reap_tombstones(
+        session: AsyncSession,
+        batch_size: int | None = None) -> int:
+    batch_size = min(batch_size or settings.gc_batch_size, MAX_DELETE_KEYS)
+    removed = 0
+    last_id = 0
+    while True:
+        res = await session.execute(
+            select(ObjectTombstone.id, ObjectTombstone.s3_key)
+            .where(
+                ObjectTombstone.id > last_id,
+                ObjectTombstone.attempts < settings.gc_max_attempts)
+            .order_by(ObjectTombstone.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True))
+        rows = res.all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        keys = [r.s3_key for r in rows]
+        # На ключ снова ссылается строка: объект живой, надгробие лишнее
+        live = await _referenced_keys(session, keys)
+        doomed = [k for k in keys if k not in live]
+        errors = {}
+        if doomed:
+            errors = await run_blocking(remove_objects, doomed)
+        done = [k for k in keys if k not in errors]
+        if done:
+            await session.execute(delete(ObjectTombstone).where(
+                ObjectTombstone.s3_key.in_(done)))
+        for key, code in errors.items():
+            attempts = await session.scalar(
+                update(ObjectTombstone)
+                .where(ObjectTombstone.s3_key == key)
+                .values(
+                    attempts=ObjectTombstone.attempts + 1,
+                    last_error=code)
+                .returning(ObjectTombstone.attempts))
+            if attempts is not None \
+                    and attempts >= settings.gc_max_attempts:
+                GC_ABANDONED.inc()
+                logger.error(
+                    f"Giving up on removing {key} after {attempts} "
+                    f"attempts: {code}")
+        await session.commit()
+        removed += len(doomed) - len(errors)
+        if errors:
+            logger.warning(f"Failed to remove {len(errors)} objects")
+        if len(rows) < batch_size:
+            break
+    return removed
+
+
+def _next_chunk(objects, size: int) -> list:
+    return list(islice(objects, size))
+
+
+async def reconcile_orphans(
+        session: AsyncSession,
+        batch_size: int | None = None) -> int:
+    # Сверяем листинг бакета с таблицами пачками: объекты без строки
+    # в files/blobs/активных upload_sessions получают надгробие
+    batch_size = batch_size or settings.gc_batch_size
+    cutoff = datetime.now(timezone.utc) - timedelta(
+        hours=settings.gc_orphan_grace_hours)
+    objects = list_objects()
+    found = 0
+    while True:
+        chunk = await run_blocking(_next_chunk, objects, batch_size)
+        if not chunk:
+            break
+        keys = [
+            o.object_name for o in chunk
+            if not o.is_dir and o.last_modified and o.last_modified < cutoff]
+        if keys:
+            live = await _referenced_keys(session, keys)
+            orphans = [k for k in keys if k not in live]
+            await add_tombstones(session, orphans)
+            await session.commit()
+            found += len(orphans)
+    if found:
+        logger.info(f"Found {found} orphaned objects")
+    return found
@@ -1,22 +1,52 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, Enum as SAEnum, ForeignKey, JSON, DateTime, BigInteger
+from sqlalchemy import String, Integer, Enum as SAEnum, ForeignKey, JSON, DateTime, BigInteger, Index, Text, text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from datetime import datetime
-from ..common.enums import Visibility
+from ..common.enums import Visibility, UploadStatus, UploadMode
 from ..database import Base
 
 
+class Blob(Base):
+    __tablename__ = "blobs"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    sha256: Mapped[str] = mapped_column(String(64), unique=True)
+    s3_key: Mapped[str] = mapped_column(String(255), unique=True)
+    size_bytes: Mapped[int] = mapped_column(BigInteger)
+    refcount: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow)
+
+
 class File(Base):
     __tablename__ = "files"
+    __table_args__ = (
+        Index("ix_files_created_at_id", "created_at", "id"),
+        Index("ix_files_owner_created", "owner_id", "created_at", "id"),
+        Index("ix_files_department_created",
+              "department", "created_at", "id"),
+        Index("ix_files_visibility_created",
+              "visibility", "created_at", "id"),
+        Index("ix_files_content_type_created",
+              "content_type", "created_at", "id"),
+        Index("ix_files_filename_prefix", "filename",
+              postgresql_ops={"filename": "varchar_pattern_ops"}),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     owner_id: Mapped[int] = mapped_column(
-        ForeignKey("users.id", ondelete="CASCADE"), index=True)
-    department: Mapped[str] = mapped_column(String(100), index=True)
+        ForeignKey("users.id", ondelete="CASCADE"))
+    department: Mapped[str] = mapped_column(String(100))
     filename: Mapped[str] = mapped_column(String(255))
     content_type: Mapped[str] = mapped_column(String(100))
     size_bytes: Mapped[int] = mapped_column(BigInteger)
     visibility: Mapped[Visibility] = mapped_column(
         SAEnum(Visibility), default=Visibility.PRIVATE)
-    s3_key: Mapped[str] = mapped_column(String(255), unique=True, index=True)
+    s3_key: Mapped[str] = mapped_column(String(255), index=True)
+    # sha256 содержимого или ETag объекта в S3, для условных запросов
+    etag: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    blob_id: Mapped[int | None] = mapped_column(
+        ForeignKey("blobs.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow)
     downloads: Mapped[int] = mapped_column(Integer, default=0)
@@ -30,8 +60,98 @@ class File(Base):
 
 class FileMetadata(Base):
     __tablename__ = "file_metadata"
+    __table_args__ = (
+        Index("ix_file_metadata_search_vector", "search_vector",
+              postgresql_using="gin"),
+        Index("ix_file_metadata_type", text("(raw ->> 'type')")),
+        Index("ix_file_metadata_author",
+              text("lower(raw ->> 'author')")),
+        Index("ix_file_metadata_pages",
+              text("((raw ->> 'pages')::integer)")),
+        Index("ix_file_metadata_created", text("(raw ->> 'created')")),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     file_id: Mapped[int] = mapped_column(ForeignKey(
         "files.id", ondelete="CASCADE"), unique=True)
-    raw: Mapped[dict] = mapped_column(JSON, default=dict)
+    raw: Mapped[dict] = mapped_column(JSONB, default=dict)
+    # Текст документа (обрезанный) для поиска и подсветки; NULL - файл
+    # разобран до появления поиска
+    content: Mapped[str | None] = mapped_column(
+        Text, nullable=True, deferred=True)
+    search_vector = mapped_column(TSVECTOR, nullable=True, deferred=True)
     file = relationship("File", back_populates="metadata_rel")
+
+
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    owner_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    department: Mapped[str] = mapped_column(String(100))
+    filename: Mapped[str] = mapped_column(String(255))
+    content_type: Mapped[str] = mapped_column(String(100))
+    size_bytes: Mapped[int] = mapped_column(BigInteger)
+    visibility: Mapped[Visibility] = mapped_column(
+        SAEnum(Visibility), default=Visibility.PRIVATE)
+    s3_key: Mapped[str] = mapped_column(String(255), unique=True)
+    mode: Mapped[UploadMode] = mapped_column(
+        SAEnum(UploadMode), default=UploadMode.MULTIPART)
+    s3_upload_id: Mapped[str | None] = mapped_column(
+        String(255), nullable=True)
+    part_size: Mapped[int] = mapped_column(BigInteger)
+    part_count: Mapped[int] = mapped_column(Integer)
+    status: Mapped[UploadStatus] = mapped_column(
+        SAEnum(UploadStatus), default=UploadStatus.ACTIVE, index=True)
+    file_id: Mapped[int | None] = mapped_column(
+        ForeignKey("files.id", ondelete="SET NULL"), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, index=True)
+    parts = relationship(
+        "UploadPart",
+        back_populates="session",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="UploadPart.part_number")
+
+
+class UploadPart(Base):
+    __tablename__ = "upload_parts"
+    session_id: Mapped[str] = mapped_column(ForeignKey(
+        "upload_sessions.id", ondelete="CASCADE"), primary_key=True)
+    part_number: Mapped[int] = mapped_column(Integer, primary_key=True)
+    etag: Mapped[str] = mapped_column(String(255))
+    size_bytes: Mapped[int] = mapped_column(BigInteger)
+    session = relationship("UploadSession", back_populates="parts")
+
+
+class ObjectTombstone(Base):
+    # Объекты хранилища, которые осталось удалить (см. files/gc.py)
+    __tablename__ = "object_tombstones"
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    s3_key: Mapped[str] = mapped_column(String(255), unique=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    last_error: Mapped[str | None] = mapped_column(
+        String(255), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow)
+
+
+class DownloadFlush(Base):
+    # Сбросы счётчиков скачиваний, уже применённые к files.downloads
+    # (см. files/downloads.py)
+    __tablename__ = "download_flushes"
+    batch_id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    applied_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, index=True)
+
+
+class OutboxMessage(Base):
+    # Задачи для брокера, записанные вместе с изменением (см. files/outbox.py)
+    __tablename__ = "outbox"
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    topic: Mapped[str] = mapped_column(String(64))
+    payload: Mapped[dict] = mapped_column(JSON)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow)
@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from contextlib import suppress
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from .models import File, OutboxMessage
+from .tasks import enqueue_extraction
+from ..database import SessionLocal
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+EXTRACT_METADATA = "extract_metadata"
+
+_wakeup = asyncio.Event()
+
+
+def add_extraction(session: AsyncSession, rec: File) -> None:
+    # Пишется в транзакции вставки файла: задача не потеряется, даже
+    # если брокер недоступен в момент загрузки
+    session.add(OutboxMessage(
+        topic=EXTRACT_METADATA,
+        payload={
+            "file_id": rec.id,
+            "content_type": rec.content_type,
+            "size": rec.size_bytes}))
+
+
+def notify() -> None:
+    _wakeup.set()
+
+
+def _publish(messages: list[OutboxMessage]) -> None:
+    enqueue_extraction([
+        (m.payload["file_id"], m.payload["content_type"], m.payload["size"])
+        for m in messages if m.topic == EXTRACT_METADATA])
+
+
+async def relay_once(batch_size: int | None = None) -> int:
+    batch_size = batch_size or settings.outbox_batch_size
+    async with SessionLocal() as session:
+        res = await session.execute(
+            select(OutboxMessage)
+            .order_by(OutboxMessage.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True))
+        messages = res.scalars().all()
+        if not messages:
+            return 0
+        # Публикация до удаления: при сбое между ними сообщение уйдёт
+        # повторно, задачи к этому готовы
+        await asyncio.to_thread(_publish, messages)
+        await session.execute(delete(OutboxMessage).where(
+            OutboxMessage.id.in_([m.id for m in messages])))
+        await session.commit()
+        return len(messages)
+
+
+async def relay_forever() -> None:
+    delay = settings.outbox_poll_interval
+    while True:
+        _wakeup.clear()
+        try:
+            sent = await relay_once()
+            delay = settings.outbox_poll_interval
+        except Exception as e:
+            logger.warning(f"Outbox relay failed: {e}")
+            sent = 0
+            delay = min(delay * 2, 30.0)
+        if sent >= settings.outbox_batch_size:
+            continue
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(_wakeup.wait(), delay)
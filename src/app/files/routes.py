@@ -1,15 +1,42 @@
-from fastapi import APIRouter, Depends, UploadFile, File as F, Form, HTTPException
+import uuid
+from datetime import datetime
+from typing import Literal
+from fastapi import APIRouter, Depends, UploadFile, File as F, Form, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, or_
+from sqlalchemy import select, delete, update, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from ..deps import get_current_user
-from ..database import get_session
-from ..auth.models import User
-from ..common.enums import Visibility, Role
-from .models import File as FileModel, FileMetadata
-from .schemas import FileOut, FileList, FileMetaOut
-from .service import validate_upload, store_file, MAX_SIZE
-from ..storage.minio_client import get_presigned_url
-from .tasks import extract_metadata_task
+from ..database import get_session, get_read_session, estimate_count
+from ..auth.principal import Principal
+from ..common.enums import Visibility, Role, UploadStatus, UploadMode
+from .models import File as FileModel, FileMetadata, UploadSession, UploadPart
+from .schemas import (FileOut, FileList, FileMetaOut, UploadInitIn,
+                      UploadSessionOut, UploadPartOut, DirectUploadIn,
+                      DirectUploadOut, FileFilters, VisibilityIn,
+                      FileBatchIn, FileBatchGetIn, FileBatchItem,
+                      FileBatchOut, SearchHit, SearchResults)
+from .service import (validate_upload, store_file, new_object_key,
+                      plan_parts, expected_part_size, MAX_SIZE, visible_to,
+                      apply_file_filters, apply_cursor, encode_cursor,
+                      check_file_access, deletable_by, id_in)
+from ..config import settings
+from ..storage.minio_client import (
+    run_transfer, get_presigned_url, create_multipart_upload_async,
+    upload_part_async, complete_multipart_upload_async,
+    abort_multipart_upload_async, stat_object_async,
+    get_presigned_put_url, get_presigned_post_policy, iter_object)
+from .blobs import (claim_blob, release_blob, release_blobs,
+                    sibling_metadata)
+from .gc import add_tombstones
+from .cache import get_cached_file, invalidate_files, mark_created
+from .downloads import (record_download, pending_downloads,
+                        with_pending_downloads)
+from .export import export_files, MEDIA_TYPES
+from .search import search_files, search_vector
+from .streaming import (download_headers, is_not_modified,
+                        parse_range)
+from .outbox import add_extraction, notify
 router = APIRouter(prefix="/files", tags=["files"])
 
 
@@ -17,13 +44,11 @@ router = APIRouter(prefix="/files", tags=["files"])
 async def upload_file(
         visibility: Visibility = Form(...),
         file: UploadFile = F(...),
-        user: User = Depends(get_current_user),
+        user: Principal = Depends(get_current_user),
         session: AsyncSession = Depends(get_session)):
-    validate_upload(user, file, visibility)
-    data = await file.read()
-    if len(data) > MAX_SIZE[user.role]:
-        raise HTTPException(400, f"File too large for role {user.role}")
-    key, size = store_file(file, data)
+    validate_upload(user, file.content_type, visibility, file.size)
+    key, size, sha256 = await run_transfer(store_file, user, file)
+    blob_id, blob_key = await claim_blob(session, sha256, key, size)
     rec = FileModel(
         owner_id=user.id,
         department=user.department,
@@ -31,95 +56,566 @@ async def upload_file(
         content_type=file.content_type or "application/octet-stream",
         size_bytes=size,
         visibility=visibility,
-        s3_key=key)
+        s3_key=blob_key,
+        blob_id=blob_id,
+        etag=sha256)
     session.add(rec)
+    await session.flush()
+    meta = None
+    if blob_key != key:
+        # Такое содержимое уже хранится: свою копию удаляем
+        await add_tombstones(session, [key])
+        meta = await sibling_metadata(session, blob_id, rec.id)
+    if meta is not None:
+        raw, text = meta
+        session.add(FileMetadata(
+            file_id=rec.id,
+            raw=raw,
+            content=text,
+            search_vector=search_vector(rec.filename, raw.get("title"), text)))
+    else:
+        add_extraction(session, rec)
     await session.commit()
+    await mark_created([rec.id])
     await session.refresh(rec)
-    extract_metadata_task.delay(rec.id)
+    notify()
     return rec
 
 
+def _upload_out(
+        upload: UploadSession,
+        completed_parts: list[int]) -> UploadSessionOut:
+    return UploadSessionOut(
+        upload_id=upload.id,
+        filename=upload.filename,
+        size_bytes=upload.size_bytes,
+        part_size=upload.part_size,
+        part_count=upload.part_count,
+        status=upload.status,
+        completed_parts=completed_parts,
+        file_id=upload.file_id)
+
+
+async def _get_upload(
+        session: AsyncSession,
+        upload_id: str,
+        user: Principal,
+        lock: bool = False) -> UploadSession:
+    q = select(UploadSession).where(UploadSession.id == upload_id)
+    if lock:
+        q = q.with_for_update()
+    res = await session.execute(q)
+    upload = res.scalar_one_or_none()
+    if not upload or upload.owner_id != user.id:
+        raise HTTPException(404, "Upload not found")
+    return upload
+
+
+async def _finish_upload(
+        session: AsyncSession,
+        upload: UploadSession,
+        size: int,
+        etag: str | None) -> FileModel:
+    rec = FileModel(
+        owner_id=upload.owner_id,
+        department=upload.department,
+        filename=upload.filename,
+        content_type=upload.content_type,
+        size_bytes=size,
+        visibility=upload.visibility,
+        s3_key=upload.s3_key,
+        etag=etag)
+    session.add(rec)
+    await session.flush()
+    upload.status = UploadStatus.COMPLETED
+    upload.file_id = rec.id
+    upload.updated_at = datetime.utcnow()
+    add_extraction(session, rec)
+    await session.commit()
+    await mark_created([rec.id])
+    await session.refresh(rec)
+    notify()
+    return rec
+
+
+async def _completed_file(
+        session: AsyncSession,
+        upload: UploadSession) -> FileModel:
+    rec = await session.get(FileModel, upload.file_id)
+    if not rec:
+        raise HTTPException(404, "Not found")
+    return rec
+
+
+async def _read_part(request: Request, expected: int) -> bytes:
+    length = request.headers.get("content-length")
+    if length is not None and int(length) != expected:
+        raise HTTPException(400, f"Part must be {expected} bytes")
+    buf = bytearray()
+    async for chunk in request.stream():
+        buf.extend(chunk)
+        if len(buf) > expected:
+            raise HTTPException(400, f"Part must be {expected} bytes")
+    if len(buf) != expected:
+        raise HTTPException(400, f"Part must be {expected} bytes")
+    return bytes(buf)
+
+
+@router.post("/uploads", response_model=UploadSessionOut)
+async def create_upload(
+        payload: UploadInitIn,
+        user: Principal = Depends(get_current_user),
+        session: AsyncSession = Depends(get_session)):
+    validate_upload(
+        user, payload.content_type, payload.visibility, payload.size_bytes)
+    part_size, part_count = plan_parts(payload.size_bytes)
+    key = new_object_key(payload.filename)
+    s3_upload_id = await create_multipart_upload_async(
+        key, payload.content_type)
+    upload = UploadSession(
+        id=uuid.uuid4().hex,
+        owner_id=user.id,
+        department=user.department,
+        filename=payload.filename,
+        content_type=payload.content_type,
+        size_bytes=payload.size_bytes,
+        visibility=payload.visibility,
+        s3_key=key,
+        mode=UploadMode.MULTIPART,
+        s3_upload_id=s3_upload_id,
+        part_size=part_size,
+        part_count=part_count,
+        status=UploadStatus.ACTIVE)
+    session.add(upload)
+    await session.commit()
+    return _upload_out(upload, [])
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadSessionOut)
+async def get_upload(
+        upload_id: str,
+        user: Principal = Depends(get_current_user),
+        session: AsyncSession = Depends(get_session)):
+    upload = await _get_upload(session, upload_id, user)
+    res = await session.execute(
+        select(UploadPart.part_number)
+        .where(UploadPart.session_id == upload.id)
+        .order_by(UploadPart.part_number))
+    return _upload_out(upload, list(res.scalars()))
+
+
+@router.put("/uploads/{upload_id}/parts/{part_number}",
+            response_model=UploadPartOut)
+async def put_upload_part(
+        upload_id: str,
+        part_number: int,
+        request: Request,
+        user: Principal = Depends(get_current_user),
+        session: AsyncSession = Depends(get_session)):
+    upload = await _get_upload(session, upload_id, user)
+    if upload.mode != UploadMode.MULTIPART:
+        raise HTTPException(404, "Upload not found")
+    if upload.status != UploadStatus.ACTIVE:
+        raise HTTPException(409, "Upload is not active")
+    if not 1 <= part_number <= upload.part_count:
+        raise HTTPException(400, "Invalid part number")
+    # Не держим соединение с БД, пока принимаем и отправляем часть
+    await session.commit()
+    data = await _read_part(request, expected_part_size(upload, part_number))
+    etag = await upload_part_async(
+        upload.s3_key, upload.s3_upload_id, part_number, data)
+    stmt = pg_insert(UploadPart).values(
+        session_id=upload.id,
+        part_number=part_number,
+        etag=etag,
+        size_bytes=len(data))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UploadPart.session_id, UploadPart.part_number],
+        set_={"etag": stmt.excluded.etag,
+              "size_bytes": stmt.excluded.size_bytes})
+    await session.execute(stmt)
+    await session.execute(
+        update(UploadSession)
+        .where(UploadSession.id == upload.id)
+        .values(updated_at=datetime.utcnow()))
+    await session.commit()
+    return UploadPartOut(
+        part_number=part_number, etag=etag, size_bytes=len(data))
+
+
+@router.post("/uploads/{upload_id}/complete", response_model=FileOut)
+async def complete_upload(
+        upload_id: str,
+        user: Principal = Depends(get_current_user),
+        session: AsyncSession = Depends(get_session)):
+    upload = await _get_upload(session, upload_id, user, lock=True)
+    if upload.mode != UploadMode.MULTIPART:
+        raise HTTPException(404, "Upload not found")
+    if upload.status == UploadStatus.COMPLETED:
+        return await _completed_file(session, upload)
+    res = await session.execute(
+        select(UploadPart)
+        .where(UploadPart.session_id == upload.id)
+        .order_by(UploadPart.part_number))
+    parts = res.scalars().all()
+    if [p.part_number for p in parts] != list(
+            range(1, upload.part_count + 1)):
+        raise HTTPException(409, "Upload has missing parts")
+    etag = await complete_multipart_upload_async(
+        upload.s3_key,
+        upload.s3_upload_id,
+        [(p.part_number, p.etag) for p in parts])
+    return await _finish_upload(session, upload, upload.size_bytes, etag)
+
+
+@router.post("/direct-uploads", response_model=DirectUploadOut)
+async def create_direct_upload(
+        payload: DirectUploadIn,
+        user: Principal = Depends(get_current_user),
+        session: AsyncSession = Depends(get_session)):
+    validate_upload(
+        user, payload.content_type, payload.visibility, payload.size_bytes)
+    key = new_object_key(payload.filename)
+    expires = settings.direct_upload_expires_seconds
+    upload = UploadSession(
+        id=uuid.uuid4().hex,
+        owner_id=user.id,
+        department=user.department,
+        filename=payload.filename,
+        content_type=payload.content_type,
+        size_bytes=payload.size_bytes,
+        visibility=payload.visibility,
+        s3_key=key,
+        mode=UploadMode.DIRECT,
+        part_size=payload.size_bytes,
+        part_count=1,
+        status=UploadStatus.ACTIVE)
+    session.add(upload)
+    await session.commit()
+    if payload.method == "POST":
+        url, fields = get_presigned_post_policy(
+            key, payload.content_type, MAX_SIZE[user.role], expires)
+        return DirectUploadOut(
+            upload_id=upload.id,
+            method="POST",
+            url=url,
+            fields=fields,
+            expires_in=expires)
+    return DirectUploadOut(
+        upload_id=upload.id,
+        method="PUT",
+        url=get_presigned_put_url(key, expires),
+        headers={"Content-Type": payload.content_type},
+        expires_in=expires)
+
+
+def _media_type(content_type: str | None) -> str:
+    return (content_type or "").split(";", 1)[0].strip().lower()
+
+
+@router.post("/direct-uploads/{upload_id}/complete", response_model=FileOut)
+async def complete_direct_upload(
+        upload_id: str,
+        user: Principal = Depends(get_current_user),
+        session: AsyncSession = Depends(get_session)):
+    upload = await _get_upload(session, upload_id, user, lock=True)
+    if upload.mode != UploadMode.DIRECT:
+        raise HTTPException(404, "Upload not found")
+    if upload.status == UploadStatus.COMPLETED:
+        return await _completed_file(session, upload)
+    stat = await stat_object_async(upload.s3_key)
+    if stat is None:
+        raise HTTPException(409, "Object has not been uploaded yet")
+    # Клиент мог получить ссылку на маленький разрешённый файл, а
+    # загрузить другой: принимаем только объявленный и проверенный
+    error = None
+    if stat.size > MAX_SIZE[user.role]:
+        error = f"File too large for role {user.role}"
+    elif stat.size != upload.size_bytes:
+        error = f"Uploaded {stat.size} bytes, declared {upload.size_bytes}"
+    elif _media_type(stat.content_type) != _media_type(upload.content_type):
+        error = (f"Uploaded {stat.content_type}, "
+                 f"declared {upload.content_type}")
+    if error:
+        await add_tombstones(session, [upload.s3_key])
+        await session.execute(
+            delete(UploadSession).where(UploadSession.id == upload.id))
+        await session.commit()
+        raise HTTPException(400, error)
+    return await _finish_upload(session, upload, stat.size, stat.etag)
+
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload(
+        upload_id: str,
+        user: Principal = Depends(get_current_user),
+        session: AsyncSession = Depends(get_session)):
+    upload = await _get_upload(session, upload_id, user, lock=True)
+    if upload.status == UploadStatus.COMPLETED:
+        raise HTTPException(409, "Upload already completed")
+    if upload.mode == UploadMode.MULTIPART:
+        await abort_multipart_upload_async(
+            upload.s3_key, upload.s3_upload_id)
+    else:
+        await add_tombstones(session, [upload.s3_key])
+    await session.execute(
+        delete(UploadSession).where(UploadSession.id == upload.id))
+    await session.commit()
+    return {"status": "aborted"}
+
+
+def file_filters(
+        filters: FileFilters = Depends(),
+        meta_type: str | None = Query(None, alias="meta.type")) -> FileFilters:
+    # meta.type= не может быть полем модели: имя не идентификатор
+    if meta_type is not None:
+        filters.meta_type = meta_type
+    return filters
+
+
 @router.get("/", response_model=FileList)
 async def list_files(
-        session: AsyncSession = Depends(get_session),
-        user: User = Depends(get_current_user)):
-    q = select(FileModel)
-    if user.role == Role.ADMIN:
-        pass
-    elif user.role == Role.MANAGER:
-        q = q.where(or_(FileModel.visibility == Visibility.PUBLIC,
-                        FileModel.visibility == Visibility.DEPARTMENT,
-                        FileModel.owner_id == user.id))
-    else:
-        q = q.where(
-            or_(
-                FileModel.visibility == Visibility.PUBLIC,
-                (FileModel.visibility == Visibility.DEPARTMENT) & (
-                    FileModel.department == user.department),
-                FileModel.owner_id == user.id))
-    res = await session.execute(q)
+        filters: FileFilters = Depends(file_filters),
+        limit: int = Query(
+            settings.list_default_page_size,
+            ge=1,
+            le=settings.list_max_page_size),
+        cursor: str | None = None,
+        sort: Literal["created_at", "-created_at"] = "-created_at",
+        count: Literal["none", "estimate", "exact"] = "none",
+        session: AsyncSession = Depends(get_read_session),
+        user: Principal = Depends(get_current_user)):
+    q = apply_file_filters(
+        select(FileModel).where(visible_to(user)), filters)
+    total = None
+    if count == "exact":
+        total = await session.scalar(
+            select(func.count()).select_from(q.subquery()))
+    elif count == "estimate":
+        total = await estimate_count(session, q)
+    page = apply_cursor(q, cursor, descending=sort.startswith("-"))
+    res = await session.execute(page.limit(limit + 1))
     items = res.scalars().all()
-    return FileList(items=items, total=len(items))
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1])
+    return FileList(
+        items=await with_pending_downloads(items),
+        total=total,
+        next_cursor=next_cursor)
+
+
+@router.get("/export")
+async def export_file_list(
+        filters: FileFilters = Depends(file_filters),
+        format: Literal["ndjson", "csv"] = "ndjson",
+        user: Principal = Depends(get_current_user)):
+    return StreamingResponse(
+        export_files(user, filters, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition":
+                 f'attachment; filename="files.{format}"'})
+
+
+@router.get("/search", response_model=SearchResults)
+async def search_file_contents(
+        q: str = Query(min_length=1, max_length=200),
+        filters: FileFilters = Depends(file_filters),
+        limit: int = Query(
+            settings.list_default_page_size,
+            ge=1,
+            le=settings.list_max_page_size),
+        offset: int = Query(0, ge=0, le=settings.search_max_offset),
+        session: AsyncSession = Depends(get_read_session),
+        user: Principal = Depends(get_current_user)):
+    res = await session.execute(
+        search_files(user, q, filters, limit, offset))
+    rows = res.all()
+    outs = await with_pending_downloads([row[0] for row in rows])
+    return SearchResults(items=[
+        SearchHit(file=out, rank=row.rank, snippet=row.snippet)
+        for out, row in zip(outs, rows)])
+
+
+@router.post("/batch/get", response_model=FileBatchOut)
+async def batch_get_files(
+        data: FileBatchGetIn,
+        session: AsyncSession = Depends(get_session),
+        user: Principal = Depends(get_current_user)):
+    ids = list(dict.fromkeys(data.ids))
+    res = await session.execute(
+        select(
+            FileModel,
+            visible_to(user).label("allowed"),
+            FileMetadata.raw)
+        .outerjoin(FileMetadata, FileMetadata.file_id == FileModel.id)
+        .where(id_in(ids)))
+    rows = {row[0].id: row for row in res.all()}
+    allowed = [rec for rec, ok, _ in rows.values() if ok]
+    outs = {out.id: out for out in await with_pending_downloads(allowed)}
+    items = []
+    for file_id in ids:
+        if file_id not in rows:
+            items.append(FileBatchItem(
+                id=file_id, status=404, error="Not found"))
+            continue
+        rec, ok, raw = rows[file_id]
+        if not ok:
+            items.append(FileBatchItem(
+                id=file_id, status=403, error="Not allowed"))
+            continue
+        items.append(FileBatchItem(
+            id=file_id,
+            status=200,
+            file=outs[file_id],
+            metadata=(raw or {}) if data.metadata else None,
+            url=get_presigned_url(rec.s3_key) if data.urls else None))
+    return FileBatchOut(items=items)
+
+
+@router.post("/batch/delete", response_model=FileBatchOut)
+async def batch_delete_files(
+        data: FileBatchIn,
+        session: AsyncSession = Depends(get_session),
+        user: Principal = Depends(get_current_user)):
+    ids = list(dict.fromkeys(data.ids))
+    res = await session.execute(
+        select(
+            FileModel.id,
+            FileModel.s3_key,
+            FileModel.blob_id,
+            deletable_by(user).label("allowed"))
+        .where(id_in(ids))
+        .with_for_update(of=FileModel))
+    rows = {row.id: row for row in res.all()}
+    doomed = [row for row in rows.values() if row.allowed]
+    if doomed:
+        orphans = [row.s3_key for row in doomed if row.blob_id is None]
+        orphans += await release_blobs(
+            session, [row.blob_id for row in doomed if row.blob_id])
+        await add_tombstones(session, orphans)
+        await session.execute(
+            delete(FileModel).where(id_in([row.id for row in doomed])))
+        await session.commit()
+        await invalidate_files([row.id for row in doomed])
+    items = []
+    for file_id in ids:
+        if file_id not in rows:
+            items.append(FileBatchItem(
+                id=file_id, status=404, error="Not found"))
+        elif not rows[file_id].allowed:
+            items.append(FileBatchItem(
+                id=file_id, status=403, error="Not allowed"))
+        else:
+            items.append(FileBatchItem(id=file_id, status=200))
+    return FileBatchOut(items=items)
 
 
 @router.get("/{file_id}", response_model=FileOut)
 async def get_file_info(
         file_id: int,
-        session: AsyncSession = Depends(get_session),
-        user: User = Depends(get_current_user)):
-    rec = await session.get(FileModel, file_id)
-    if not rec:
+        user: Principal = Depends(get_current_user)):
+    cached = await get_cached_file(file_id)
+    if not cached:
         raise HTTPException(404, "Not found")
-    if user.role != Role.ADMIN:
-        if rec.visibility == Visibility.PRIVATE and rec.owner_id != user.id:
-            raise HTTPException(403, "Not allowed")
-        if rec.visibility == Visibility.DEPARTMENT and user.role == Role.USER and rec.department != user.department:
-            raise HTTPException(403, "Not allowed")
-    return rec
+    check_file_access(
+        user, cached.owner_id, cached.department, cached.visibility)
+    pending = (await pending_downloads([file_id])).get(file_id)
+    if not pending:
+        return Response(cached.info, media_type="application/json")
+    out = FileOut.model_validate_json(cached.info)
+    return out.model_copy(update={"downloads": out.downloads + pending})
 
 
-@router.get("/{file_id}/download")
+@router.api_route("/{file_id}/download", methods=["GET", "HEAD"])
 async def download_file(
         file_id: int,
+        request: Request,
+        mode: Literal["url", "proxy"] = "url",
         session: AsyncSession = Depends(get_session),
-        user: User = Depends(get_current_user)):
+        user: Principal = Depends(get_current_user)):
     rec = await session.get(FileModel, file_id)
     if not rec:
         raise HTTPException(404, "Not found")
-    if user.role != Role.ADMIN:
-        if rec.visibility == Visibility.PRIVATE and rec.owner_id != user.id:
-            raise HTTPException(403, "Not allowed")
-        if rec.visibility == Visibility.DEPARTMENT and user.role == Role.USER and rec.department != user.department:
-            raise HTTPException(403, "Not allowed")
-    rec.downloads += 1
-    await session.commit()
-    url = get_presigned_url(rec.s3_key)
-    return {"url": url}
+    check_file_access(user, rec.owner_id, rec.department, rec.visibility)
+    if mode == "url" and request.method == "GET":
+        await record_download(session, rec.id)
+        url = get_presigned_url(rec.s3_key)
+        return {"url": url}
+    # Прокси-режим: объект идёт через API, HEAD отвечает его заголовками
+    headers = download_headers(rec)
+    if is_not_modified(
+            rec,
+            request.headers.get("if-none-match"),
+            request.headers.get("if-modified-since")):
+        return Response(status_code=304, headers=headers)
+    byte_range = parse_range(
+        request.headers.get("range"), request.headers.get("if-range"), rec)
+    start, end = byte_range or (0, rec.size_bytes - 1)
+    headers["Content-Length"] = str(end - start + 1)
+    status = 200
+    if byte_range:
+        status = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{rec.size_bytes}"
+    if request.method == "HEAD":
+        return Response(
+            status_code=status, headers=headers, media_type=rec.content_type)
+    if start == 0:
+        await record_download(session, rec.id)
+    # Соединение с БД не держим, пока идёт поток
+    await session.close()
+    return StreamingResponse(
+        iter_object(rec.s3_key, start, end - start + 1),
+        status_code=status,
+        headers=headers,
+        media_type=rec.content_type)
 
 
 @router.get("/{file_id}/metadata", response_model=FileMetaOut)
 async def get_metadata(
         file_id: int,
+        user: Principal = Depends(get_current_user)):
+    cached = await get_cached_file(file_id)
+    if not cached:
+        raise HTTPException(404, "Not found")
+    check_file_access(
+        user, cached.owner_id, cached.department, cached.visibility)
+    return Response(cached.meta, media_type="application/json")
+
+
+@router.put("/{file_id}/visibility", response_model=FileOut)
+async def change_visibility(
+        file_id: int,
+        data: VisibilityIn,
         session: AsyncSession = Depends(get_session),
-        user: User = Depends(get_current_user)):
+        user: Principal = Depends(get_current_user)):
     rec = await session.get(FileModel, file_id)
     if not rec:
         raise HTTPException(404, "Not found")
-    if user.role != Role.ADMIN:
-        if rec.visibility == Visibility.PRIVATE and rec.owner_id != user.id:
-            raise HTTPException(403, "Not allowed")
-        if rec.visibility == Visibility.DEPARTMENT and user.role == Role.USER and rec.department != user.department:
-            raise HTTPException(403, "Not allowed")
-    m = await session.execute(select(FileMetadata).where(FileMetadata.file_id == file_id))
-    meta = m.scalar_one_or_none()
-    return FileMetaOut(file_id=file_id, raw=meta.raw if meta else {})
+    if user.role == Role.ADMIN:
+        pass
+    elif user.role == Role.MANAGER:
+        if rec.department != user.department:
+            raise HTTPException(
+                403, "Managers can change only files of their department")
+    else:
+        if rec.owner_id != user.id:
+            raise HTTPException(403, "Users can change only their files")
+        if data.visibility != Visibility.PRIVATE:
+            raise HTTPException(403, "USER can create only PRIVATE files")
+    rec.visibility = data.visibility
+    await session.commit()
+    await invalidate_files([file_id])
+    [out] = await with_pending_downloads([rec])
+    return out
 
 
 @router.delete("/{file_id}")
 async def delete_file(
         file_id: int,
         session: AsyncSession = Depends(get_session),
-        user: User = Depends(get_current_user)):
+        user: Principal = Depends(get_current_user)):
     rec = await session.get(FileModel, file_id)
     if not rec:
         raise HTTPException(404, "Not found")
@@ -132,6 +628,11 @@ async def delete_file(
     else:
         if rec.owner_id != user.id:
             raise HTTPException(403, "Users can delete only their files")
+    orphan_key = rec.s3_key
+    if rec.blob_id is not None:
+        orphan_key = await release_blob(session, rec.blob_id)
+    await add_tombstones(session, [orphan_key])
     await session.execute(delete(FileModel).where(FileModel.id == file_id))
     await session.commit()
+    await invalidate_files([file_id])
     return {"status": "deleted"}
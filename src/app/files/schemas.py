@@ -1,5 +1,7 @@
-from pydantic import BaseModel
-from ..common.enums import Visibility
+from datetime import datetime
+from typing import Literal
+from pydantic import BaseModel, Field
+from ..common.enums import Visibility, UploadStatus
 
 
 class FileOut(BaseModel):
@@ -20,6 +22,97 @@ class FileMetaOut(BaseModel):
     raw: dict
 
 
+class VisibilityIn(BaseModel):
+    visibility: Visibility
+
+
 class FileList(BaseModel):
     items: list[FileOut]
-    total: int
+    total: int | None = None
+    next_cursor: str | None = None
+
+
+class FileFilters(BaseModel):
+    owner_id: int | None = None
+    department: str | None = None
+    content_type: str | None = None
+    visibility: Visibility | None = None
+    created_from: datetime | None = None
+    created_to: datetime | None = None
+    filename_prefix: str | None = None
+    # Поля извлечённых метаданных
+    meta_type: str | None = None
+    author: str | None = None
+    pages_min: int | None = None
+
+
+class SearchHit(BaseModel):
+    file: FileOut
+    rank: float
+    snippet: str | None = None
+
+
+class SearchResults(BaseModel):
+    items: list[SearchHit]
+
+
+MAX_BATCH_IDS = 500
+
+
+class FileBatchIn(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=MAX_BATCH_IDS)
+
+
+class FileBatchGetIn(FileBatchIn):
+    metadata: bool = False
+    urls: bool = False
+
+
+class FileBatchItem(BaseModel):
+    id: int
+    status: int
+    error: str | None = None
+    file: FileOut | None = None
+    metadata: dict | None = None
+    url: str | None = None
+
+
+class FileBatchOut(BaseModel):
+    items: list[FileBatchItem]
+
+
+class UploadInitIn(BaseModel):
+    filename: str = Field(min_length=1, max_length=200)
+    content_type: str
+    size_bytes: int = Field(gt=0)
+    visibility: Visibility = Visibility.PRIVATE
+
+
+class UploadSessionOut(BaseModel):
+    upload_id: str
+    filename: str
+    size_bytes: int
+    part_size: int
+    part_count: int
+    status: UploadStatus
+    completed_parts: list[int] = []
+    file_id: int | None = None
+
+
+class UploadPartOut(BaseModel):
+    part_number: int
+    etag: str
+    size_bytes: int
+
+
+class DirectUploadIn(UploadInitIn):
+    method: Literal["PUT", "POST"] = "PUT"
+
+
+class DirectUploadOut(BaseModel):
+    upload_id: str
+    method: str
+    url: str
+    fields: dict[str, str] = {}
+    headers: dict[str, str] = {}
+    expires_in: int
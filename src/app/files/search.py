@@ -0,0 +1,51 @@
+from sqlalchemy import Select, func, literal, literal_column, select
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from ..auth.principal import Principal
+from ..config import settings
+from .models import File, FileMetadata
+from .schemas import FileFilters
+from .service import visible_to, apply_file_filters
+
+
+def _config():
+    return literal(settings.search_config, REGCONFIG)
+
+
+def search_vector(filename: str, title: str | None, content: str | None):
+    # Имя и заголовок весят больше текста документа
+    cfg = _config()
+    head = func.setweight(
+        func.to_tsvector(cfg, f"{filename} {title or ''}"),
+        literal_column("'A'"))
+    return head.op("||")(func.to_tsvector(cfg, content or ""))
+
+
+def search_files(
+        user: Principal,
+        q: str,
+        filters: FileFilters,
+        limit: int,
+        offset: int) -> Select:
+    query = func.websearch_to_tsquery(_config(), q)
+    rank = func.ts_rank_cd(FileMetadata.search_vector, query)
+    hits = apply_file_filters(
+        select(File.id, rank.label("rank"))
+        .join(FileMetadata, FileMetadata.file_id == File.id)
+        .where(visible_to(user), FileMetadata.search_vector.op("@@")(query)),
+        filters)
+    page = (
+        hits.order_by(rank.desc(), File.id.desc())
+        .limit(limit)
+        .offset(offset)
+        .subquery())
+    # ts_headline дорогой: считаем его только для строк страницы
+    snippet = func.ts_headline(
+        _config(),
+        FileMetadata.content,
+        query,
+        "MaxFragments=2, MinWords=5, MaxWords=20")
+    return (
+        select(File, page.c.rank, snippet.label("snippet"))
+        .join(page, page.c.id == File.id)
+        .join(FileMetadata, FileMetadata.file_id == File.id)
+        .order_by(page.c.rank.desc(), File.id.desc()))
@@ -1,8 +1,20 @@
+import base64
+import binascii
+import hashlib
+import json
 import uuid
+from datetime import datetime
+from typing import BinaryIO
 from fastapi import HTTPException, UploadFile
+from sqlalchemy import (Integer, Select, any_, bindparam, exists, func,
+                        literal_column, or_, true, tuple_)
+from sqlalchemy.dialects.postgresql import ARRAY
 from ..common.enums import Visibility, Role
-from ..auth.models import User
-from ..storage.minio_client import put_object, get_presigned_url
+from ..auth.principal import Principal
+from ..config import settings
+from .models import File, FileMetadata, UploadSession
+from .schemas import FileFilters
+from ..storage.minio_client import put_object_stream
 ALLOWED_TYPES_USER = {"application/pdf"}
 ALLOWED_TYPES_MANAGER = {
     "application/pdf",
@@ -15,20 +27,162 @@ MAX_SIZE = {
 }
 
 
-def validate_upload(user: User, file: UploadFile, visibility: Visibility):
+def validate_upload(
+        user: Principal,
+        content_type: str | None,
+        visibility: Visibility,
+        size: int | None = None):
     if user.role == Role.USER:
         if visibility != Visibility.PRIVATE:
             raise HTTPException(403, "USER can create only PRIVATE files")
-        if file.content_type not in ALLOWED_TYPES_USER:
+        if content_type not in ALLOWED_TYPES_USER:
             raise HTTPException(400, "USER can upload only PDF")
     else:
-        if file.content_type not in ALLOWED_TYPES_MANAGER and user.role != Role.ADMIN:
+        if content_type not in ALLOWED_TYPES_MANAGER and user.role != Role.ADMIN:
             raise HTTPException(400, "Unsupported file type")
-    return
+    check_size(user, size)
 
 
-def store_file(file: UploadFile, content: bytes) -> tuple[str, int]:
-    size = len(content)
-    key = f"{uuid.uuid4().hex}_{file.filename}"
-    put_object(key, content, file.content_type or "application/octet-stream")
-    return key, size
+def check_size(user: Principal, size: int | None):
+    if size is not None and size > MAX_SIZE[user.role]:
+        raise HTTPException(400, f"File too large for role {user.role}")
+
+
+class SizeLimitedReader:
+    def __init__(self, raw: BinaryIO, user: Principal):
+        self._raw = raw
+        self._user = user
+        self.bytes_read = 0
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._raw.read(size)
+        self.bytes_read += len(chunk)
+        check_size(self._user, self.bytes_read)
+        self.sha256.update(chunk)
+        return chunk
+
+
+def new_object_key(filename: str) -> str:
+    return f"{uuid.uuid4().hex}_{filename}"
+
+
+def store_file(user: Principal, file: UploadFile) -> tuple[str, int, str]:
+    check_size(user, file.size)
+    key = new_object_key(file.filename)
+    reader = SizeLimitedReader(file.file, user)
+    put_object_stream(
+        key, reader, file.content_type or "application/octet-stream")
+    return key, reader.bytes_read, reader.sha256.hexdigest()
+
+
+def plan_parts(size: int) -> tuple[int, int]:
+    part_size = settings.upload_part_size
+    return part_size, -(-size // part_size)
+
+
+def expected_part_size(upload: UploadSession, part_number: int) -> int:
+    if part_number < upload.part_count:
+        return upload.part_size
+    return upload.size_bytes - upload.part_size * (upload.part_count - 1)
+
+
+def check_file_access(
+        user: Principal,
+        owner_id: int,
+        department: str,
+        visibility: Visibility):
+    if user.role == Role.ADMIN:
+        return
+    if visibility == Visibility.PRIVATE and owner_id != user.id:
+        raise HTTPException(403, "Not allowed")
+    if visibility == Visibility.DEPARTMENT and user.role == Role.USER and department != user.department:
+        raise HTTPException(403, "Not allowed")
+
+
+def visible_to(user: Principal):
+    if user.role == Role.ADMIN:
+        return true()
+    if user.role == Role.MANAGER:
+        return or_(File.visibility == Visibility.PUBLIC,
+                   File.visibility == Visibility.DEPARTMENT,
+                   File.owner_id == user.id)
+    return or_(
+        File.visibility == Visibility.PUBLIC,
+        (File.visibility == Visibility.DEPARTMENT) & (
+            File.department == user.department),
+        File.owner_id == user.id)
+
+
+def deletable_by(user: Principal):
+    if user.role == Role.ADMIN:
+        return true()
+    if user.role == Role.MANAGER:
+        return File.department == user.department
+    return File.owner_id == user.id
+
+
+def id_in(ids: list[int]):
+    # Один параметр-массив вместо IN (...) на каждый id
+    return File.id == any_(bindparam("ids", ids, type_=ARRAY(Integer)))
+
+
+def apply_file_filters(q: Select, filters: FileFilters) -> Select:
+    if filters.owner_id is not None:
+        q = q.where(File.owner_id == filters.owner_id)
+    if filters.department is not None:
+        q = q.where(File.department == filters.department)
+    if filters.content_type is not None:
+        q = q.where(File.content_type == filters.content_type)
+    if filters.visibility is not None:
+        q = q.where(File.visibility == filters.visibility)
+    if filters.created_from is not None:
+        q = q.where(File.created_at >= filters.created_from)
+    if filters.created_to is not None:
+        q = q.where(File.created_at < filters.created_to)
+    if filters.filename_prefix:
+        q = q.where(File.filename.startswith(
+            filters.filename_prefix, autoescape=True))
+    meta = []
+    if filters.meta_type is not None:
+        meta.append(meta_text("type") == filters.meta_type)
+    if filters.author is not None:
+        meta.append(func.lower(meta_text("author")) == filters.author.lower())
+    if filters.pages_min is not None:
+        meta.append(meta_text("pages").cast(Integer) >= filters.pages_min)
+    if meta:
+        q = q.where(exists().where(FileMetadata.file_id == File.id, *meta))
+    return q
+
+
+def meta_text(key: str):
+    # Ключ литералом, а не параметром: иначе выражение не совпадёт
+    # с индексом по (raw ->> 'key')
+    return FileMetadata.raw.op("->>")(literal_column(f"'{key}'"))
+
+
+def encode_cursor(rec: File) -> str:
+    raw = json.dumps([rec.created_at.isoformat(), rec.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, file_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(file_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(400, "Invalid cursor")
+
+
+def apply_cursor(
+        q: Select,
+        cursor: str | None,
+        descending: bool) -> Select:
+    key = tuple_(File.created_at, File.id)
+    if cursor:
+        position = tuple_(*decode_cursor(cursor))
+        q = q.where(key < position if descending else key > position)
+    if descending:
+        return q.order_by(File.created_at.desc(), File.id.desc())
+    return q.order_by(File.created_at.asc(), File.id.asc())
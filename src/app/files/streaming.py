@@ -0,0 +1,83 @@
+import re
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from urllib.parse import quote
+from fastapi import HTTPException
+from .models import File
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def etag_header(rec: File) -> str | None:
+    return f'"{rec.etag}"' if rec.etag else None
+
+
+def last_modified(rec: File) -> datetime:
+    # created_at хранится в UTC без зоны; HTTP-даты с точностью до секунды
+    return rec.created_at.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def is_not_modified(
+        rec: File,
+        if_none_match: str | None,
+        if_modified_since: str | None) -> bool:
+    etag = etag_header(rec)
+    if if_none_match is not None:
+        # If-None-Match важнее If-Modified-Since (RFC 9110, 13.2.2)
+        if etag is None:
+            return False
+        tags = {
+            t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        return "*" in tags or etag in tags
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified(rec) <= since
+    return False
+
+
+def parse_range(
+        header: str | None,
+        if_range: str | None,
+        rec: File) -> tuple[int, int] | None:
+    # (start, end) включительно; None - отдать объект целиком.
+    # Несколько диапазонов не поддерживаем и отдаём весь объект
+    if not header:
+        return None
+    if if_range is not None and if_range != etag_header(rec):
+        return None
+    m = _RANGE.match(header.strip())
+    if not m:
+        return None
+    size = rec.size_bytes
+    first, last = m.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(
+            416,
+            "Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+def download_headers(rec: File) -> dict[str, str]:
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Last-Modified": format_datetime(last_modified(rec), usegmt=True),
+        "Content-Disposition":
+            f"attachment; filename*=UTF-8''{quote(rec.filename)}",
+    }
+    etag = etag_header(rec)
+    if etag:
+        headers["ETag"] = etag
+    return headers
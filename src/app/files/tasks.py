@@ -1,37 +1,268 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
 from celery import shared_task
-from sqlalchemy import select
+from minio.error import S3Error
+from urllib3.exceptions import HTTPError
+from sqlalchemy import select, delete, exists
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..database import SessionLocal
-from .models import File, FileMetadata
-from .utils.metadata_extractors import extract_pdf_meta, extract_office_meta
-from ..storage.minio_client import get_minio_client as s3_client
+from ..common.event_loop import run_async
+from ..common.enums import UploadStatus, UploadMode
+from .models import File, FileMetadata, UploadSession
+from .blobs import blobs_metadata
+from .cache import invalidate_files
+from .search import search_vector
+from .downloads import flush_downloads
+from .gc import add_tombstones, reap_tombstones, reconcile_orphans
+from .extraction import (run_extraction, is_slow, begin_attempts,
+                         forget_attempts, clear_attempts)
+from ..storage.minio_client import abort_multipart_upload
+from ..metrics import observe_extraction
 from ..config import settings
 
+logger = logging.getLogger(__name__)
+
+
+DEAD_LETTER_QUEUE = "metadata_dead"
+
 
 @shared_task
 def extract_metadata_task(file_id: int):
-    import asyncio
-    asyncio.run(_extract_metadata_async(file_id))
+    run_async(_extract_metadata_async([file_id], slow=False))
+
+
+@shared_task(
+    acks_late=True,
+    reject_on_worker_lost=True,
+    rate_limit=settings.metadata_fast_rate_limit,
+    time_limit=settings.metadata_fast_time_limit)
+def extract_metadata_batch_task(file_ids: list[int]):
+    run_async(_extract_metadata_async(file_ids, slow=False))
+
 
+@shared_task(
+    acks_late=True,
+    reject_on_worker_lost=True,
+    rate_limit=settings.metadata_slow_rate_limit,
+    time_limit=settings.metadata_slow_time_limit)
+def extract_metadata_slow_task(file_ids: list[int]):
+    run_async(_extract_metadata_async(file_ids, slow=True))
 
-async def _extract_metadata_async(file_id: int):
+
+def _lane_task(slow: bool):
+    return extract_metadata_slow_task if slow else extract_metadata_batch_task
+
+
+def enqueue_extraction(files: list[tuple[int, str, int]]) -> None:
+    # files: (id, content_type, size_bytes); очередь задаёт task_routes
+    lanes = {False: [], True: []}
+    for file_id, content_type, size in files:
+        lanes[is_slow(content_type, size)].append(file_id)
+    batch = settings.metadata_batch_size
+    for slow, ids in lanes.items():
+        for i in range(0, len(ids), batch):
+            _lane_task(slow).delay(ids[i:i + batch])
+
+
+async def _extract_metadata_async(file_ids: list[int], slow: bool):
+    task = _lane_task(slow)
+    attempts = await begin_attempts(file_ids)
+    batch, isolated, dead = [], [], []
+    for file_id in file_ids:
+        if attempts[file_id] > settings.metadata_max_attempts:
+            dead.append(file_id)
+        elif attempts[file_id] > 1 and len(file_ids) > 1:
+            # Пакет уже падал: подозрительные файлы разбираем поодиночке,
+            # чтобы один битый файл не тянул за собой соседей
+            isolated.append(file_id)
+        else:
+            batch.append(file_id)
+    for file_id in isolated:
+        task.delay([file_id])
+    await forget_attempts(isolated)
+    for file_id in dead:
+        _dead_letter(task, file_id)
+    if not batch:
+        await clear_attempts(dead)
+        return
     async with SessionLocal() as session:
-        res = await session.execute(select(File).where(File.id == file_id))
-        f = res.scalar_one_or_none()
-        if not f:
-            return
-        obj = s3_client().get_object(Bucket=settings.s3_bucket, Key=f.s3_key)
-        data = obj["Body"].read()
-        if f.content_type == "application/pdf":
-            meta = extract_pdf_meta(data)
-        elif f.content_type in {"application/msword", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"}:
-            meta = extract_office_meta(data, f.filename)
+        res = await session.execute(
+            select(
+                File.id, File.s3_key, File.size_bytes, File.content_type,
+                File.filename, File.blob_id)
+            .where(
+                File.id.in_(batch),
+                # Повторная доставка (outbox, ретраи) уже готового файла
+                ~exists().where(
+                    FileMetadata.file_id == File.id,
+                    FileMetadata.content.isnot(None))))
+        files = res.all()
+        # Тот же blob уже разобран для другого файла
+        known = await blobs_metadata(
+            session,
+            [f.blob_id for f in files if f.blob_id is not None],
+            batch)
+    timeout = (settings.metadata_slow_file_timeout if slow
+               else settings.metadata_fast_file_timeout)
+    rows = {}
+    pending = []
+    for f in files:
+        if f.blob_id in known:
+            rows[f.id] = known[f.blob_id]
         else:
-            meta = {"type": "unknown"}
-        existing = await session.execute(select(FileMetadata).where(FileMetadata.file_id == f.id))
-        m = existing.scalar_one_or_none()
-        if m:
-            m.raw = meta
+            pending.append(f)
+    results = await asyncio.gather(
+        *(_run_extraction(f, timeout) for f in pending),
+        return_exceptions=True)
+    for f, result in zip(pending, results):
+        if not isinstance(result, Exception):
+            rows[f.id] = result
+            continue
+        logger.error(f"Metadata extraction failed for file {f.id}: "
+                     f"{result!r}")
+        if attempts[f.id] >= settings.metadata_max_attempts:
+            _dead_letter(task, f.id)
+            dead.append(f.id)
         else:
-            m = FileMetadata(file_id=f.id, raw=meta)
-            session.add(m)
+            task.apply_async(
+                args=[[f.id]], countdown=30 * attempts[f.id])
+    if rows:
+        # Один INSERT ... ON CONFLICT на весь пакет
+        async with SessionLocal() as session:
+            await upsert_metadata(
+                session, rows, {f.id: f.filename for f in files})
+            await session.commit()
+        await invalidate_files(list(rows))
+    # Удалённые файлы тоже больше не ждём
+    done = set(batch) - {f.id for f in pending} | set(rows) | set(dead)
+    await clear_attempts(list(done))
+
+
+async def _run_extraction(f, timeout: float) -> tuple[dict, str]:
+    with observe_extraction(f.content_type):
+        return await run_extraction(
+            f.s3_key, f.size_bytes, f.content_type, f.filename, timeout)
+
+
+def _dead_letter(task, file_id: int) -> None:
+    # Сообщение ложится в metadata_dead как есть: чтобы разобрать
+    # очередь после исправления парсера, достаточно воркера с
+    # -Q metadata_dead; счётчик попыток сбрасывается
+    logger.error(f"File {file_id} moved to {DEAD_LETTER_QUEUE}")
+    task.apply_async(args=[[file_id]], queue=DEAD_LETTER_QUEUE)
+
+
+async def upsert_metadata(
+        session: AsyncSession,
+        rows: dict[int, tuple[dict, str]],
+        filenames: dict[int, str]) -> None:
+    stmt = pg_insert(FileMetadata).values([
+        {"file_id": file_id,
+         "raw": raw,
+         "content": text,
+         "search_vector": search_vector(
+             filenames[file_id], raw.get("title"), text)}
+        for file_id, (raw, text) in rows.items()])
+    await session.execute(stmt.on_conflict_do_update(
+        index_elements=[FileMetadata.file_id],
+        set_={
+            "raw": stmt.excluded.raw,
+            "content": stmt.excluded.content,
+            "search_vector": stmt.excluded.search_vector}))
+
+
+@shared_task
+def cleanup_upload_sessions_task():
+    run_async(_cleanup_upload_sessions_async())
+
+
+async def _cleanup_upload_sessions_async(batch_size: int = 500):
+    cutoff = datetime.utcnow() - timedelta(
+        hours=settings.upload_session_ttl_hours)
+    async with SessionLocal() as session:
+        res = await session.execute(
+            select(UploadSession)
+            .where(UploadSession.updated_at < cutoff)
+            .with_for_update(skip_locked=True)
+            .limit(batch_size))
+        uploads = res.scalars().all()
+        orphans = []
+        for upload in uploads:
+            if upload.status != UploadStatus.ACTIVE:
+                continue
+            if upload.mode == UploadMode.MULTIPART:
+                abort_multipart_upload(upload.s3_key, upload.s3_upload_id)
+            else:
+                orphans.append(upload.s3_key)
+        await add_tombstones(session, orphans)
+        if uploads:
+            await session.execute(delete(UploadSession).where(
+                UploadSession.id.in_([u.id for u in uploads])))
         await session.commit()
+
+
+@shared_task
+def flush_downloads_task():
+    run_async(_flush_downloads_async())
+
+
+async def _flush_downloads_async():
+    async with SessionLocal() as session:
+        await flush_downloads(session)
+
+
+@shared_task(
+    autoretry_for=(S3Error, HTTPError),
+    retry_backoff=True,
+    max_retries=5)
+def reap_tombstones_task():
+    run_async(_reap_tombstones_async())
+
+
+async def _reap_tombstones_async():
+    async with SessionLocal() as session:
+        await reap_tombstones(session)
+
+
+@shared_task
+def reconcile_orphans_task():
+    run_async(_reconcile_orphans_async())
+
+
+async def _reconcile_orphans_async():
+    async with SessionLocal() as session:
+        await reconcile_orphans(session)
+
+
+@shared_task
+def requeue_missing_metadata_task():
+    run_async(_requeue_missing_metadata_async())
+
+
+async def _requeue_missing_metadata_async() -> int:
+    # Файлы без FileMetadata или без текста для поиска (потерянные
+    # задачи, новые парсеры) уходят обратно в очереди пакетами,
+    # по ключу id без OFFSET
+    total = 0
+    last_id = 0
+    async with SessionLocal() as session:
+        while True:
+            res = await session.execute(
+                select(File.id, File.content_type, File.size_bytes)
+                .where(
+                    File.id > last_id,
+                    ~exists().where(
+                        FileMetadata.file_id == File.id,
+                        FileMetadata.content.isnot(None)))
+                .order_by(File.id)
+                .limit(settings.metadata_batch_size * 10))
+            rows = res.all()
+            if not rows:
+                break
+            enqueue_extraction(rows)
+            total += len(rows)
+            last_id = rows[-1].id
+    logger.info(f"Requeued metadata extraction for {total} files")
+    return total
@@ -1,15 +1,136 @@
-from pypdf import PdfReader
+from pypdf import PageObject, PdfReader
+from pypdf.errors import PdfReadError
+from pypdf.generic import IndirectObject, NameObject
 from docx import Document
-import subprocess
+import shutil
 import tempfile
 import os
 from datetime import datetime
+from typing import BinaryIO
+from .office_converter import convert_doc_to_docx
 
 
-def extract_pdf_meta(stream: bytes) -> dict:
-    reader = PdfReader(stream)
+def _page_count(reader: PdfReader) -> int:
+    # /Count из корня дерева страниц не требует обходить все страницы
+    try:
+        return int(reader.trailer["/Root"]["/Pages"]["/Count"])
+    except Exception:
+        return len(reader.pages)
+
+
+def _open_pdf(stream: BinaryIO) -> PdfReader:
+    # Нестрогий режим проверяет заголовок каждого объекта из xref,
+    # то есть читает весь файл; к нему откатываемся только для битых PDF
+    try:
+        return PdfReader(stream, strict=True)
+    except PdfReadError:
+        stream.seek(0)
+        return PdfReader(stream)
+
+
+def _clean_meta(meta: dict) -> dict:
+    # NUL не принимают ни text, ни jsonb в Postgres, а пакет пишется
+    # одним INSERT: один такой PDF уронил бы весь пакет
+    return {
+        k: v.replace("\x00", "") if isinstance(v, str) else v
+        for k, v in meta.items()}
+
+
+def _collect_text(parts, limit: int) -> str:
+    # Пробелы схлопываем, текст обрезаем: для поиска больше не нужно,
+    # а страницы после лимита не читаются из хранилища вовсе.
+    # NUL (см. _clean_meta) считаем пробелом между словами
+    out, total = [], 0
+    for part in parts:
+        words = " ".join(part.replace("\x00", " ").split())
+        if not words:
+            continue
+        out.append(words)
+        total += len(words) + 1
+        if total >= limit:
+            break
+    return " ".join(out)[:limit]
+
+
+INHERITABLE = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+
+
+def _walk_pages(reader: PdfReader, ref, inherited: dict, seen: set):
+    node = ref.get_object()
+    if isinstance(ref, IndirectObject):
+        if ref.idnum in seen:
+            return
+        seen.add(ref.idnum)
+    if "/Kids" in node:
+        attrs = dict(inherited)
+        attrs.update((k, node.raw_get(k)) for k in INHERITABLE if k in node)
+        for kid in node.raw_get("/Kids").get_object():
+            yield from _walk_pages(reader, kid, attrs, seen)
+        return
+    page = PageObject(
+        reader, ref if isinstance(ref, IndirectObject) else None)
+    page.update(node)
+    for k, v in inherited.items():
+        if k not in page:
+            page[NameObject(k)] = v
+    yield page
+
+
+def _iter_pages(reader: PdfReader):
+    # По одной странице: reader.pages при первом обращении читает
+    # словари всех страниц, а они разбросаны по всему файлу
+    done = 0
+    try:
+        root = reader.trailer["/Root"].raw_get("/Pages")
+        for page in _walk_pages(reader, root, {}, set()):
+            done += 1
+            yield page
+        return
+    except Exception:
+        pass
+    # Битое дерево страниц: дальше как pypdf
+    for page in reader.pages[done:]:
+        yield page
+
+
+def _pdf_pages_text(
+        reader: PdfReader,
+        stream: BinaryIO,
+        max_pages: int = 0,
+        max_bytes: int = 0):
+    # Содержимое страниц - основной объём PDF: без пределов по страницам
+    # и скачанному текст ради 100k символов тянет почти весь объект.
+    # Скачанное считает RangedObjectReader, у обычного файла предела нет
+    fetched = getattr(stream, "bytes_fetched", None)
+    for number, page in enumerate(_iter_pages(reader)):
+        if max_pages and number >= max_pages:
+            return
+        if max_bytes and fetched is not None \
+                and stream.bytes_fetched - fetched >= max_bytes:
+            return
+        try:
+            yield page.extract_text() or ""
+        except Exception:
+            continue
+
+
+def _docx_text(doc):
+    for p in doc.paragraphs:
+        yield p.text
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                yield cell.text
+
+
+def extract_pdf(
+        stream: BinaryIO,
+        text_limit: int = 0,
+        max_pages: int = 0,
+        max_bytes: int = 0) -> tuple[dict, str]:
+    reader = _open_pdf(stream)
     info = reader.metadata or {}
-    pages = len(reader.pages)
+    pages = _page_count(reader)
 
     def _get(x):
         try:
@@ -17,47 +138,55 @@ def extract_pdf_meta(stream: bytes) -> dict:
             return str(v) if v is not None else None
         except Exception:
             return None
-    return {
+    meta = {
         "type": "pdf",
         "pages": pages,
         "author": _get("/Author"),
         "title": _get("/Title"),
         "created": _get("/CreationDate"),
         "producer": _get("/Producer") or _get("/Creator")}
+    text = ""
+    if text_limit:
+        text = _collect_text(
+            _pdf_pages_text(reader, stream, max_pages, max_bytes),
+            text_limit)
+    return _clean_meta(meta), text
 
 
-def _convert_doc_to_docx(input_path: str) -> str:
-    out_dir = os.path.dirname(input_path)
-    subprocess.run(["libreoffice", "--headless", "--convert-to",
-                   "docx", "--outdir", out_dir, input_path], check=True)
-    return input_path.rsplit(".", 1)[0] + ".docx"
-
-
-def extract_docx_meta_from_path(path: str) -> dict:
-    doc = Document(path)
+def extract_docx(
+        source: str | BinaryIO,
+        text_limit: int = 0) -> tuple[dict, str]:
+    doc = Document(source)
     cp = doc.core_properties
     paragraphs = len(doc.paragraphs)
     tables = len(doc.tables)
     created = cp.created if cp.created else None
     if isinstance(created, datetime):
         created = created.isoformat()
-    return {
+    meta = {
         "type": "docx",
         "paragraphs": paragraphs,
         "tables": tables,
         "title": cp.title,
         "author": cp.author,
         "created": created}
+    text = ""
+    if text_limit:
+        text = _collect_text(_docx_text(doc), text_limit)
+    return _clean_meta(meta), text
 
 
-def extract_office_meta(stream: bytes, filename: str) -> dict:
+def extract_office(
+        stream: BinaryIO,
+        filename: str,
+        text_limit: int = 0) -> tuple[dict, str]:
     suffix = filename.lower().split(".")[-1]
+    if suffix != "doc":
+        return extract_docx(stream, text_limit)
+    # LibreOffice умеет работать только с файлом на диске
     with tempfile.TemporaryDirectory() as td:
-        in_path = os.path.join(td, filename)
+        in_path = os.path.join(td, os.path.basename(filename))
         with open(in_path, "wb") as f:
-            f.write(stream)
-        if suffix == "doc":
-            docx_path = _convert_doc_to_docx(in_path)
-            return extract_docx_meta_from_path(docx_path)
-        else:
-            return extract_docx_meta_from_path(in_path)
+            shutil.copyfileobj(stream, f, 1024 * 1024)
+        docx_path = convert_doc_to_docx(in_path)
+        return extract_docx(docx_path, text_limit)
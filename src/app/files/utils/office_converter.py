@@ -0,0 +1,204 @@
+import atexit
+import functools
+import logging
+import os
+import queue
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import time
+import threading
+from ...config import settings
+
+try:
+    from unoserver.client import UnoClient
+except ImportError:
+    UnoClient = None
+
+logger = logging.getLogger(__name__)
+
+
+class ConversionError(RuntimeError):
+    pass
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.2)
+    raise ConversionError(f"Converter did not start on port {port}")
+
+
+def _kill_group(process: subprocess.Popen) -> None:
+    # Группа может пережить лидера (soffice после падения unoserver)
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    process.wait()
+
+
+class _Instance:
+    # Один тёплый soffice под unoserver со своим профилем: профили
+    # не делятся, поэтому экземпляры не блокируют друг друга
+
+    def __init__(self, index: int):
+        self.index = index
+        self.jobs = 0
+        self.port = None
+        self.process = None
+        self.profile_dir = tempfile.mkdtemp(prefix=f"lo_profile_{index}_")
+
+    def start(self) -> None:
+        self.port = _free_port()
+        self.process = subprocess.Popen(
+            [settings.unoserver_bin,
+             "--interface", "127.0.0.1",
+             "--port", str(self.port),
+             "--uno-port", str(_free_port()),
+             "--user-installation", f"file://{self.profile_dir}"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            # unoserver запускает soffice дочерним процессом: своя группа,
+            # чтобы остановить их вместе
+            start_new_session=True)
+        _wait_for_port(self.port, settings.office_converter_start_timeout)
+        self.jobs = 0
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self) -> None:
+        if self.process is not None:
+            _kill_group(self.process)
+        self.process = None
+
+    def recycle(self) -> None:
+        self.stop()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+        os.makedirs(self.profile_dir, exist_ok=True)
+
+    def convert(self, in_path: str, out_path: str, timeout: float) -> None:
+        # Вызов в отдельном потоке: зависший soffice не должен держать
+        # воркер дольше таймаута, а поток сам завершится после kill
+        errors = []
+
+        def call():
+            try:
+                client = UnoClient(server="127.0.0.1", port=str(self.port))
+                client.convert(
+                    inpath=in_path, outpath=out_path, convert_to="docx")
+            except Exception as e:
+                errors.append(e)
+
+        worker = threading.Thread(target=call, daemon=True)
+        worker.start()
+        worker.join(timeout)
+        if worker.is_alive():
+            raise TimeoutError(f"Conversion timed out: {in_path}")
+        if errors:
+            raise errors[0]
+
+
+class OfficeConverterPool:
+
+    def __init__(self, size: int):
+        self._idle: queue.Queue[_Instance] = queue.Queue()
+        self._instances = [_Instance(i) for i in range(size)]
+        for inst in self._instances:
+            self._idle.put(inst)
+
+    def convert(self, in_path: str, out_path: str) -> str:
+        try:
+            inst = self._idle.get(
+                timeout=settings.office_converter_queue_timeout)
+        except queue.Empty:
+            raise ConversionError("No free converter instance")
+        try:
+            if not inst.alive():
+                inst.start()
+            try:
+                inst.convert(
+                    in_path, out_path, settings.office_convert_timeout)
+            except Exception as e:
+                inst.recycle()
+                raise ConversionError(f"Conversion failed: {e}") from e
+            inst.jobs += 1
+            if inst.jobs >= settings.office_converter_max_jobs:
+                inst.recycle()
+            return out_path
+        finally:
+            self._idle.put(inst)
+
+    def shutdown(self) -> None:
+        for inst in self._instances:
+            inst.stop()
+            shutil.rmtree(inst.profile_dir, ignore_errors=True)
+
+
+@functools.lru_cache(maxsize=1)
+def get_converter_pool() -> OfficeConverterPool:
+    pool = OfficeConverterPool(settings.office_converter_pool_size)
+    atexit.register(pool.shutdown)
+    return pool
+
+
+# Дочерний процесс заводит свой пул, чужие soffice не трогаем
+os.register_at_fork(after_in_child=get_converter_pool.cache_clear)
+
+
+def _convert_cold(in_path: str, out_path: str) -> str:
+    # Без unoserver: разовый запуск, но со своим профилем и таймаутом,
+    # чтобы параллельные конвертации не упирались в блокировку профиля
+    with tempfile.TemporaryDirectory(prefix="lo_profile_") as profile:
+        try:
+            process = subprocess.Popen(
+                ["libreoffice", "--headless",
+                 f"-env:UserInstallation=file://{profile}",
+                 "--convert-to", "docx",
+                 "--outdir", os.path.dirname(out_path), in_path],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True)
+        except OSError as e:
+            raise ConversionError(f"Conversion failed: {e}") from e
+        try:
+            code = process.wait(timeout=settings.office_convert_timeout)
+        except subprocess.TimeoutExpired as e:
+            # libreoffice - обёртка над soffice.bin, убиваем обоих
+            _kill_group(process)
+            raise ConversionError(f"Conversion failed: {e}") from e
+        if code != 0:
+            raise ConversionError(
+                f"Conversion failed: libreoffice exited with {code}")
+    return out_path
+
+
+@functools.lru_cache(maxsize=1)
+def _pool_enabled() -> bool:
+    if settings.office_converter_pool_size < 1:
+        return False
+    if UnoClient is None:
+        logger.warning(
+            "OFFICE_CONVERTER_POOL_SIZE is set but unoserver is not "
+            "installed, converting .doc files without the pool")
+        return False
+    return True
+
+
+def convert_doc_to_docx(in_path: str) -> str:
+    out_path = in_path.rsplit(".", 1)[0] + ".docx"
+    if not _pool_enabled():
+        return _convert_cold(in_path, out_path)
+    return get_converter_pool().convert(in_path, out_path)
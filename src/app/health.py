@@ -0,0 +1,36 @@
+import asyncio
+import logging
+from datetime import datetime
+from sqlalchemy import select
+from .config import settings
+from .database import SessionLocal
+from .storage.minio_client import bucket_exists_async
+
+logger = logging.getLogger(__name__)
+
+_state = {"ok": False, "detail": "Health probe has not run yet",
+          "checked_at": None}
+
+
+def get_health() -> dict:
+    return dict(_state)
+
+
+async def probe_once() -> None:
+    try:
+        async with SessionLocal() as db:
+            await db.execute(select(1))
+        if not await bucket_exists_async():
+            raise RuntimeError("MinIO bucket not available")
+        _state.update(ok=True, detail=None)
+    except Exception as e:
+        if _state["ok"]:
+            logger.warning(f"Health probe failed: {e}")
+        _state.update(ok=False, detail=str(e))
+    _state["checked_at"] = datetime.utcnow()
+
+
+async def probe_forever() -> None:
+    while True:
+        await probe_once()
+        await asyncio.sleep(settings.health_probe_interval)
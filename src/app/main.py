@@ -1,27 +1,25 @@
+import asyncio
 import uvicorn
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.responses import JSONResponse
-from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, Response
+from contextlib import asynccontextmanager, suppress
 from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.app.config import settings
-from src.app.database import engine, Base, SessionLocal
+from src.app.database import (
+    engine, Base, SessionLocal, replica_configured, check_replica,
+    watch_replica)
 from src.app.auth.models import User
 from src.app.auth.security import hash_password
 from src.app.common.enums import Role
 from src.app.auth.routes import router as auth_router
 from src.app.files.routes import router as files_router
 from src.app.users.routes import router as users_router
-from src.app.storage.minio_client import get_minio_client
-
-
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        await db.close()
+from src.app.storage.minio_client import ensure_bucket_async
+from src.app.files.outbox import relay_forever
+from src.app.health import get_health, probe_once, probe_forever
+from src.app.metrics import (
+    MetricsMiddleware, metrics_response, watch_loop_lag, mark_process_dead)
 
 app = FastAPI(
     title=settings.app_name,
@@ -33,26 +31,23 @@ app = FastAPI(
 
 
 @app.get("/health", tags=["healthcheck"])
-async def health_check(db: AsyncSession = Depends(get_db)) -> JSONResponse:
-
-    try:
-        await db.execute(select(1))
-        minio = get_minio_client()
-        if not minio.bucket_exists(settings.minio_bucket_files):
-            raise HTTPException(
-                status_code=503,
-                detail="MinIO bucket not available"
-            )
-
-        return JSONResponse(
-            content={"status": "ok", "version": "1.0.0"},
-            status_code=200
-        )
-    except Exception as e:
+async def health_check() -> JSONResponse:
+    # Состояние обновляет фоновая проверка, сам запрос в сеть не ходит
+    health = get_health()
+    if not health["ok"]:
         raise HTTPException(
             status_code=503,
-            detail=f"Service unavailable: {str(e)}"
+            detail=f"Service unavailable: {health['detail']}"
         )
+    return JSONResponse(
+        content={"status": "ok", "version": "1.0.0"},
+        status_code=200
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    return await metrics_response()
 
 
 @asynccontextmanager
@@ -76,14 +71,27 @@ async def lifespan(app: FastAPI):
                 ))
             await db.commit()
 
-    minio = get_minio_client()
-    if not minio.bucket_exists(settings.minio_bucket_files):
-        minio.make_bucket(settings.minio_bucket_files)
+    await ensure_bucket_async()
+    await probe_once()
+    probe = asyncio.create_task(probe_forever())
+    relay = asyncio.create_task(relay_forever())
+    tasks = [probe, relay, asyncio.create_task(watch_loop_lag())]
+    if replica_configured():
+        # До первой проверки чтения идут на основную базу
+        await check_replica()
+        tasks.append(asyncio.create_task(watch_replica()))
 
     yield
 
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    mark_process_dead()
+
 
 app.router.lifespan_context = lifespan
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(auth_router, prefix="/api/v1/auth", tags=["auth"])
 app.include_router(files_router, prefix="/api/v1/files", tags=["files"])
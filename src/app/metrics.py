@@ -0,0 +1,322 @@
+import asyncio
+import functools
+import logging
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+    Histogram, generate_latest, multiprocess, start_http_server)
+from prometheus_client.core import GaugeMetricFamily
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.responses import Response
+from .common.redis_client import get_sync_redis
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Метки только из конечных множеств: шаблон маршрута, а не путь,
+# класс статуса, вид запроса, имя операции или задачи
+HTTP_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+STATEMENTS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+CONTENT_TYPES = {
+    "application/pdf": "pdf",
+    "application/msword": "doc",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+        "docx",
+}
+
+FAST_BUCKETS = (
+    .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0)
+TASK_BUCKETS = (.1, .5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+HTTP_DURATION = Histogram(
+    "filevault_http_request_duration_seconds",
+    "HTTP request duration by route template",
+    ["method", "route", "status"])
+HTTP_IN_PROGRESS = Gauge(
+    "filevault_http_requests_in_progress",
+    "HTTP requests being served",
+    ["method"],
+    multiprocess_mode="livesum")
+LOOP_LAG = Histogram(
+    "filevault_event_loop_lag_seconds",
+    "How late the event loop wakes up a sleeping coroutine",
+    buckets=FAST_BUCKETS)
+DB_POOL_WAIT = Histogram(
+    "filevault_db_pool_wait_seconds",
+    "Time to check out a connection from the pool",
+    ["engine"],
+    buckets=FAST_BUCKETS)
+DB_QUERY_DURATION = Histogram(
+    "filevault_db_query_duration_seconds",
+    "Database statement duration",
+    ["engine", "statement"],
+    buckets=FAST_BUCKETS)
+STORAGE_DURATION = Histogram(
+    "filevault_storage_request_duration_seconds",
+    "Object storage call duration",
+    ["operation"])
+STORAGE_BYTES = Counter(
+    "filevault_storage_bytes",
+    "Bytes sent to or read from object storage",
+    ["operation"])
+STORAGE_ERRORS = Counter(
+    "filevault_storage_errors",
+    "Failed object storage calls",
+    ["operation"])
+TASK_DURATION = Histogram(
+    "filevault_task_duration_seconds",
+    "Celery task run time",
+    ["task"],
+    buckets=TASK_BUCKETS)
+TASK_FAILURES = Counter(
+    "filevault_task_failures",
+    "Celery tasks that raised",
+    ["task"])
+EXTRACTION_DURATION = Histogram(
+    "filevault_metadata_extraction_seconds",
+    "Metadata extraction time per file",
+    ["content_type"],
+    buckets=TASK_BUCKETS)
+GC_ABANDONED = Counter(
+    "filevault_gc_abandoned_objects",
+    "Objects whose deletion was given up after GC_MAX_ATTEMPTS failures")
+EXTRACTIONS = Counter(
+    "filevault_metadata_extractions",
+    "Metadata extractions by outcome",
+    ["content_type", "outcome"])
+
+
+def _multiprocess() -> bool:
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+def content_type_label(content_type: str | None) -> str:
+    return CONTENT_TYPES.get(content_type, "other")
+
+
+class MetricsMiddleware:
+    # Чистый ASGI: BaseHTTPMiddleware буферизует потоковые ответы
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        if method not in HTTP_METHODS:
+            method = "OTHER"
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = HTTP_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_progress.dec()
+            # Маршрут известен только после роутинга; FastAPI кладёт его
+            # в scope, несовпавшие пути сливаются в одну метку
+            route = getattr(scope.get("route"), "path", None)
+            HTTP_DURATION.labels(
+                method, route or "unmatched", f"{status // 100}xx"
+            ).observe(time.perf_counter() - started)
+
+
+async def watch_loop_lag() -> None:
+    loop = asyncio.get_running_loop()
+    interval = settings.metrics_loop_lag_interval
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        LOOP_LAG.observe(max(0.0, loop.time() - expected))
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    # Событие checkout приходит, когда соединение уже получено, поэтому
+    # ожидание меряем вокруг _do_get (сюда входит и открытие нового)
+    metrics_engine = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.labels(self.metrics_engine).observe(
+                time.perf_counter() - started)
+
+
+@functools.lru_cache(maxsize=None)
+def timed_pool(name: str) -> type[TimedQueuePool]:
+    # Метка в классе: dispose() пересоздаёт пул через self.__class__
+    return type(
+        f"TimedQueuePool_{name}", (TimedQueuePool,), {"metrics_engine": name})
+
+
+def _statement_label(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[:1]
+    kind = word[0].upper() if word else ""
+    return kind if kind in STATEMENTS else "OTHER"
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("query_started", None)
+        if started is None:
+            return
+        DB_QUERY_DURATION.labels(name, _statement_label(statement)).observe(
+            time.perf_counter() - started)
+
+
+def observe_storage(operation: str):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception:
+                STORAGE_ERRORS.labels(operation).inc()
+                raise
+            finally:
+                STORAGE_DURATION.labels(operation).observe(
+                    time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def count_storage_bytes(operation: str, size: int) -> None:
+    STORAGE_BYTES.labels(operation).inc(size)
+
+
+@contextmanager
+def observe_extraction(content_type: str | None):
+    label = content_type_label(content_type)
+    outcome = "error"
+    started = time.perf_counter()
+    try:
+        yield
+        outcome = "ok"
+    except TimeoutError:
+        outcome = "timeout"
+        raise
+    finally:
+        EXTRACTION_DURATION.labels(label).observe(
+            time.perf_counter() - started)
+        EXTRACTIONS.labels(label, outcome).inc()
+
+
+class QueueDepthCollector:
+    # Длина очередей брокера на момент сбора: в redis очередь celery -
+    # это список с именем очереди
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        from src.celery_app import celery_app
+        queues = [q.name for q in celery_app.conf.task_queues]
+        try:
+            with get_sync_redis().pipeline(transaction=False) as pipe:
+                for queue in queues:
+                    pipe.llen(queue)
+                depths = pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Queue depth unavailable: {e}")
+            return
+        gauge = GaugeMetricFamily(
+            "filevault_celery_queue_depth",
+            "Messages waiting in the broker queue",
+            labels=["queue"])
+        for queue, depth in zip(queues, depths):
+            gauge.add_metric([queue], depth)
+        yield gauge
+
+
+@functools.lru_cache(maxsize=1)
+def _registry() -> CollectorRegistry:
+    if not _multiprocess():
+        return REGISTRY
+    # Каждый процесс пишет свои значения в PROMETHEUS_MULTIPROC_DIR,
+    # при сборе они складываются
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+@functools.lru_cache(maxsize=1)
+def _api_registry() -> CollectorRegistry:
+    registry = _registry()
+    registry.register(QueueDepthCollector())
+    return registry
+
+
+async def metrics_response() -> Response:
+    # Сбор синхронный и ходит в redis: не держим им цикл событий
+    data = await asyncio.to_thread(generate_latest, _api_registry())
+    return Response(data, media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead(pid: int | None = None) -> None:
+    if _multiprocess():
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+def _task_label(task) -> str:
+    return task.name.rsplit(".", 1)[-1] if task is not None else "unknown"
+
+
+_task_started: dict[str, float] = {}
+
+
+def _on_task_prerun(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+def _on_task_postrun(task_id=None, task=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        TASK_DURATION.labels(_task_label(task)).observe(
+            time.perf_counter() - started)
+
+
+def _on_task_failure(sender=None, **kwargs):
+    TASK_FAILURES.labels(_task_label(sender)).inc()
+
+
+def _on_worker_ready(**kwargs):
+    if settings.metrics_worker_port:
+        start_http_server(settings.metrics_worker_port, registry=_registry())
+
+
+def _on_worker_process_shutdown(pid=None, **kwargs):
+    mark_process_dead(pid)
+
+
+def instrument_celery() -> None:
+    from celery import signals
+    signals.task_prerun.connect(_on_task_prerun, weak=False)
+    signals.task_postrun.connect(_on_task_postrun, weak=False)
+    signals.task_failure.connect(_on_task_failure, weak=False)
+    signals.worker_ready.connect(_on_worker_ready, weak=False)
+    signals.worker_process_shutdown.connect(
+        _on_worker_process_shutdown, weak=False)
@@ -1,2 +1,6 @@
-from .minio_client import put_object, get_presigned_url
-__all__ = ['put_object', 'get_presigned_url']
+from .minio_client import (
+    put_object, put_object_stream, get_presigned_url, run_blocking,
+    run_transfer, put_object_async, put_object_stream_async)
+__all__ = [
+    'put_object', 'put_object_stream', 'get_presigned_url', 'run_blocking',
+    'run_transfer', 'put_object_async', 'put_object_stream_async']
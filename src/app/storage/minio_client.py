@@ -1,20 +1,98 @@
+import minio
 from minio import Minio
+from minio.datatypes import Object, Part, PostPolicy
+from minio.deleteobjects import DeleteObject
 from minio.error import S3Error
+import asyncio
+import certifi
+import functools
 import logging
+import os
+import urllib3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, BinaryIO, Iterator
 from ..config import settings
+from ..metrics import observe_storage, count_storage_bytes
 
 logger = logging.getLogger(__name__)
 
 
-def get_minio_client():
+@functools.lru_cache(maxsize=1)
+def get_minio_client() -> Minio:
+    http_client = urllib3.PoolManager(
+        num_pools=4,
+        maxsize=settings.minio_pool_size,
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+        timeout=urllib3.Timeout(
+            connect=settings.minio_connect_timeout,
+            read=settings.minio_read_timeout),
+        retries=urllib3.Retry(
+            total=settings.minio_max_retries,
+            backoff_factor=0.2,
+            status_forcelist=[500, 502, 503, 504]))
     return Minio(
         endpoint=settings.minio_endpoint.split('://')[-1],
         access_key=settings.minio_access_key,
         secret_key=settings.minio_secret_key,
-        secure=settings.minio_secure
+        secure=settings.minio_secure,
+        # С заданным регионом presign не делает GetBucketLocation
+        region=settings.minio_region,
+        http_client=http_client
     )
 
 
+@functools.lru_cache(maxsize=1)
+def _get_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=settings.storage_max_workers,
+        thread_name_prefix="storage")
+
+
+@functools.lru_cache(maxsize=1)
+def _get_transfer_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=settings.storage_transfer_workers,
+        thread_name_prefix="storage-transfer")
+
+
+def _reset_after_fork():
+    # Пул соединений и потоки не переживают fork (celery prefork)
+    get_minio_client.cache_clear()
+    _get_executor.cache_clear()
+    _get_transfer_executor.cache_clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+async def run_blocking(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), functools.partial(fn, *args, **kwargs))
+
+
+async def run_transfer(fn, *args, **kwargs):
+    # Для вызовов, которые держат поток всю передачу от клиента
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_transfer_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def _offload(fn, run=run_blocking):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run(fn, *args, **kwargs)
+    return wrapper
+
+
+@observe_storage("bucket_exists")
+def bucket_exists() -> bool:
+    client = get_minio_client()
+    return client.bucket_exists(settings.minio_bucket_files)
+
+
 def ensure_bucket():
     try:
         client = get_minio_client()
@@ -26,6 +104,7 @@ def ensure_bucket():
         raise
 
 
+@observe_storage("put_object")
 def put_object(key: str, content: bytes, content_type: str) -> None:
     client = get_minio_client()
 
@@ -33,6 +112,7 @@ def put_object(key: str, content: bytes, content_type: str) -> None:
     from io import BytesIO
     data = BytesIO(content)
     length = len(content)
+    count_storage_bytes("put_object", length)
 
     client.put_object(
         settings.minio_bucket_files,
@@ -43,15 +123,214 @@ def put_object(key: str, content: bytes, content_type: str) -> None:
     )
 
 
+class _CountingReader:
+    def __init__(self, raw: BinaryIO, operation: str):
+        self._raw = raw
+        self._operation = operation
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._raw.read(size)
+        count_storage_bytes(self._operation, len(chunk))
+        return chunk
+
+
+@observe_storage("put_object_stream")
+def put_object_stream(
+        key: str,
+        stream: BinaryIO,
+        content_type: str,
+        part_size: int | None = None) -> None:
+    # Неизвестная длина: minio сам режет поток на части и делает
+    # multipart upload, в памяти держится не больше одной части
+    client = get_minio_client()
+    client.put_object(
+        settings.minio_bucket_files,
+        key,
+        _CountingReader(stream, "put_object_stream"),
+        length=-1,
+        content_type=content_type,
+        part_size=part_size or settings.upload_part_size,
+        num_parallel_uploads=1
+    )
+
+
+def _multipart(client: Minio, name: str):
+    # Multipart с частями от клиента minio открывает только приватными
+    # методами Minio (_create_multipart_upload, _upload_part,
+    # _complete_multipart_upload, _abort_multipart_upload). Их сигнатуры
+    # одинаковы во всей ветке 7.2, к ней и привязана зависимость в
+    # pyproject.toml; при обновлении minio сверить вызовы ниже
+    try:
+        return getattr(client, name)
+    except AttributeError:
+        raise RuntimeError(
+            f"minio {minio.__version__} has no Minio.{name}, "
+            "multipart uploads need minio 7.2.x") from None
+
+
+@observe_storage("create_multipart_upload")
+def create_multipart_upload(key: str, content_type: str) -> str:
+    client = get_minio_client()
+    return _multipart(client, "_create_multipart_upload")(
+        settings.minio_bucket_files,
+        key,
+        {"Content-Type": content_type}
+    )
+
+
+@observe_storage("upload_part")
+def upload_part(
+        key: str,
+        upload_id: str,
+        part_number: int,
+        data: bytes) -> str:
+    client = get_minio_client()
+    count_storage_bytes("upload_part", len(data))
+    return _multipart(client, "_upload_part")(
+        settings.minio_bucket_files,
+        key,
+        data,
+        None,
+        upload_id,
+        part_number
+    )
+
+
+@observe_storage("complete_multipart_upload")
+def complete_multipart_upload(
+        key: str,
+        upload_id: str,
+        parts: list[tuple[int, str]]) -> str:
+    client = get_minio_client()
+    return _multipart(client, "_complete_multipart_upload")(
+        settings.minio_bucket_files,
+        key,
+        upload_id,
+        [Part(number, etag) for number, etag in parts]
+    ).etag
+
+
+@observe_storage("abort_multipart_upload")
+def abort_multipart_upload(key: str, upload_id: str) -> None:
+    client = get_minio_client()
+    try:
+        _multipart(client, "_abort_multipart_upload")(
+            settings.minio_bucket_files, key, upload_id)
+    except S3Error as e:
+        if e.code != "NoSuchUpload":
+            raise
+
+
+@observe_storage("stat_object")
+def stat_object(key: str) -> Object | None:
+    client = get_minio_client()
+    try:
+        return client.stat_object(settings.minio_bucket_files, key)
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchObject"):
+            return None
+        raise
+
+
+@observe_storage("get_object")
+def get_object(key: str, offset: int = 0, length: int = 0):
+    # length=0 - до конца объекта; ответ читается потоком, не целиком
+    client = get_minio_client()
+    return client.get_object(
+        settings.minio_bucket_files, key, offset=offset, length=length)
+
+
+async def iter_object(
+        key: str,
+        offset: int = 0,
+        length: int = 0) -> AsyncIterator[bytes]:
+    response = await run_blocking(get_object, key, offset, length)
+    try:
+        chunks = response.stream(settings.download_chunk_size)
+        while True:
+            chunk = await run_blocking(next, chunks, None)
+            if chunk is None:
+                break
+            count_storage_bytes("get_object", len(chunk))
+            yield chunk
+    finally:
+        response.close()
+        response.release_conn()
+
+
+@observe_storage("remove_object")
+def remove_object(key: str) -> None:
+    client = get_minio_client()
+    client.remove_object(settings.minio_bucket_files, key)
+
+
+@observe_storage("remove_objects")
+def remove_objects(keys: list[str]) -> dict[str, str]:
+    # Один DeleteObjects на пачку (S3 принимает до 1000 ключей);
+    # возвращает ключи, которые удалить не удалось, с кодом ошибки
+    client = get_minio_client()
+    errors = client.remove_objects(
+        settings.minio_bucket_files,
+        [DeleteObject(key) for key in keys])
+    # Запрос уходит только при итерации по результату
+    return {e.name: e.code for e in errors}
+
+
+def list_objects(prefix: str | None = None) -> Iterator[Object]:
+    client = get_minio_client()
+    return client.list_objects(
+        settings.minio_bucket_files, prefix=prefix, recursive=True)
+
+
+def get_presigned_put_url(key: str, expires: int) -> str:
+    client = get_minio_client()
+    return client.presigned_put_object(
+        bucket_name=settings.minio_bucket_files,
+        object_name=key,
+        expires=timedelta(seconds=expires)
+    )
+
+
+def get_presigned_post_policy(
+        key: str,
+        content_type: str,
+        max_size: int,
+        expires: int) -> tuple[str, dict[str, str]]:
+    client = get_minio_client()
+    policy = PostPolicy(
+        settings.minio_bucket_files,
+        datetime.now(timezone.utc) + timedelta(seconds=expires))
+    policy.add_equals_condition("key", key)
+    policy.add_equals_condition("Content-Type", content_type)
+    policy.add_content_length_range_condition(1, max_size)
+    fields = client.presigned_post_policy(policy)
+    fields["key"] = key
+    fields["Content-Type"] = content_type
+    scheme = "https" if settings.minio_secure else "http"
+    endpoint = settings.minio_endpoint.split('://')[-1]
+    return f"{scheme}://{endpoint}/{settings.minio_bucket_files}", fields
+
+
 def get_presigned_url(key: str, expires: int = 3600) -> str:
     try:
-        ensure_bucket()
         client = get_minio_client()
         return client.presigned_get_object(
             bucket_name=settings.minio_bucket_files,
             object_name=key,
-            expires=expires
+            expires=timedelta(seconds=expires)
         )
     except Exception as e:
         logger.error(f"MinIO presigned URL generation failed: {e}")
         raise
+
+
+bucket_exists_async = _offload(bucket_exists)
+ensure_bucket_async = _offload(ensure_bucket)
+put_object_async = _offload(put_object)
+put_object_stream_async = _offload(put_object_stream, run_transfer)
+create_multipart_upload_async = _offload(create_multipart_upload)
+upload_part_async = _offload(upload_part, run_transfer)
+complete_multipart_upload_async = _offload(complete_multipart_upload)
+abort_multipart_upload_async = _offload(abort_multipart_upload)
+stat_object_async = _offload(stat_object)
+remove_object_async = _offload(remove_object)
@@ -0,0 +1,98 @@
+import io
+from collections import OrderedDict
+from ..config import settings
+from ..metrics import observe_storage, count_storage_bytes
+from .minio_client import get_minio_client, stat_object
+
+
+class RangedObjectReader(io.RawIOBase):
+    # Файл-подобный доступ к объекту MinIO: читаются только нужные
+    # блоки через ranged GET, последние блоки держим в LRU-кэше
+
+    def __init__(
+            self,
+            key: str,
+            size: int,
+            block_size: int | None = None,
+            cache_blocks: int | None = None):
+        super().__init__()
+        self.key = key
+        self.size = size
+        self.bytes_fetched = 0
+        self._pos = 0
+        self._block_size = block_size or settings.metadata_block_size
+        self._cache_blocks = cache_blocks or settings.metadata_cache_blocks
+        self._blocks: OrderedDict[int, bytes] = OrderedDict()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError("Negative seek position")
+        self._pos = pos
+        return pos
+
+    @observe_storage("ranged_get")
+    def _get_range(self, offset: int, length: int) -> bytes:
+        response = get_minio_client().get_object(
+            settings.minio_bucket_files, self.key,
+            offset=offset, length=length)
+        try:
+            block = response.read()
+        finally:
+            response.close()
+            response.release_conn()
+        count_storage_bytes("ranged_get", len(block))
+        return block
+
+    def _fetch(self, index: int) -> bytes:
+        block = self._blocks.get(index)
+        if block is not None:
+            self._blocks.move_to_end(index)
+            return block
+        offset = index * self._block_size
+        block = self._get_range(
+            offset, min(self._block_size, self.size - offset))
+        self.bytes_fetched += len(block)
+        self._blocks[index] = block
+        while len(self._blocks) > self._cache_blocks:
+            self._blocks.popitem(last=False)
+        return block
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast("B")
+        wanted = min(len(view), max(0, self.size - self._pos))
+        done = 0
+        while done < wanted:
+            index, start = divmod(self._pos, self._block_size)
+            chunk = self._fetch(index)[start:start + wanted - done]
+            if not chunk:
+                break
+            view[done:done + len(chunk)] = chunk
+            done += len(chunk)
+            self._pos += len(chunk)
+        return done
+
+
+def open_object(key: str, size: int | None = None) -> RangedObjectReader:
+    if size is None:
+        stat = stat_object(key)
+        if stat is None:
+            raise FileNotFoundError(key)
+        size = stat.size
+    return RangedObjectReader(key, size)
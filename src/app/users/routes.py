@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from ..database import get_session
+from ..database import get_session, get_read_session
 from ..auth.models import User
 from ..auth.schemas import UserCreate, UserOut
-from ..auth.security import hash_password
+from ..auth.principal import Principal, invalidate_principal
+from ..auth.security import hash_password_async
 from ..deps import require_role, get_current_user
 from ..common.enums import Role
 
@@ -24,11 +25,11 @@ async def create_user(
         full_name=payload.full_name,
         department=payload.department,
         role=payload.role,
-        hashed_password=hash_password(
-            payload.password))
+        hashed_password=await hash_password_async(payload.password))
     session.add(u)
     await session.commit()
     await session.refresh(u)
+    await invalidate_principal(u.email)
     return u
 
 
@@ -52,13 +53,14 @@ async def change_role(
         raise HTTPException(404, "Not found")
     u.role = role
     await session.commit()
+    await invalidate_principal(u.email)
     return {"status": "ok"}
 
 
 @router.get("/", response_model=list[UserOut])
 async def list_department_users(
-        session: AsyncSession = Depends(get_session),
-        user: User = Depends(get_current_user)):
+        session: AsyncSession = Depends(get_read_session),
+        user: Principal = Depends(get_current_user)):
     if user.role in (Role.MANAGER, Role.ADMIN):
         res = await session.execute(select(User))
     else:
@@ -1,5 +1,7 @@
 from celery import Celery
+from kombu import Queue
 from src.app.config import settings
+from src.app.metrics import instrument_celery
 
 celery_app = Celery(
     'filevault',
@@ -14,4 +16,48 @@ celery_app.conf.update(
     accept_content=['json'],
     timezone='UTC',
     enable_utc=True,
+    # Воркеры запускаются на свою очередь, параллелизм и prefetch
+    # задаются на воркер:
+    #   -Q metadata_fast --pool=solo --prefetch-multiplier=4
+    #   -Q metadata_slow --pool=solo --prefetch-multiplier=1
+    #   -Q celery -c 2
+    # Разбор внутри воркера метаданных идёт в пуле процессов
+    # (METADATA_EXTRACT_PROCESSES), metadata_dead никто не слушает
+    task_queues=(
+        Queue('celery'),
+        Queue('metadata_fast'),
+        Queue('metadata_slow'),
+        Queue('metadata_dead'),
+    ),
+    task_default_queue='celery',
+    task_routes={
+        'src.app.files.tasks.extract_metadata_task': {
+            'queue': 'metadata_fast'},
+        'src.app.files.tasks.extract_metadata_batch_task': {
+            'queue': 'metadata_fast'},
+        'src.app.files.tasks.extract_metadata_slow_task': {
+            'queue': 'metadata_slow'},
+    },
+    worker_prefetch_multiplier=1,
+    beat_schedule={
+        'cleanup-upload-sessions': {
+            'task': 'src.app.files.tasks.cleanup_upload_sessions_task',
+            'schedule': 3600.0,
+        },
+        'flush-download-counters': {
+            'task': 'src.app.files.tasks.flush_downloads_task',
+            'schedule': settings.downloads_flush_interval,
+        },
+        'reap-object-tombstones': {
+            'task': 'src.app.files.tasks.reap_tombstones_task',
+            'schedule': settings.gc_reap_interval,
+        },
+        'reconcile-orphaned-objects': {
+            'task': 'src.app.files.tasks.reconcile_orphans_task',
+            'schedule': settings.gc_reconcile_interval,
+        },
+    },
 )
+
+# Длительность и ошибки задач; /metrics воркера - на METRICS_WORKER_PORT
+instrument_celery()
@@ -0,0 +1,15 @@
+import pytest
+from .fakes import install_fake_redis
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def redis():
+    # Свежий fakeredis на каждый тест, общий для sync и async клиентов
+    from src.app.common.redis_client import get_redis
+    install_fake_redis()
+    return get_redis()
@@ -0,0 +1,16 @@
+"""In-process stand-ins for the tests, also used by ``benchmarks``."""
+import types
+
+
+def install_fake_redis() -> None:
+    # fakeredis в памяти процесса, общий для sync и async клиентов
+    import fakeredis
+    from src.app.common import redis_client
+    server = fakeredis.FakeServer()
+    redis_client.aioredis = types.SimpleNamespace(
+        from_url=lambda _: fakeredis.FakeAsyncRedis(server=server))
+    sync = types.SimpleNamespace(
+        from_url=lambda _: fakeredis.FakeRedis(server=server))
+    redis_client.redis = types.SimpleNamespace(Redis=sync)
+    redis_client.get_redis.cache_clear()
+    redis_client.get_sync_redis.cache_clear()
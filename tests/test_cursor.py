@@ -0,0 +1,66 @@
+import base64
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from src.app.files.models import File
+from src.app.files.service import apply_cursor, decode_cursor, encode_cursor
+
+
+def _rec(created_at: datetime, file_id: int):
+    return SimpleNamespace(created_at=created_at, id=file_id)
+
+
+@pytest.mark.parametrize("created_at", [
+    datetime(2025, 8, 16, 6, 26, 33),
+    datetime(2025, 8, 16, 6, 26, 33, 72474),
+])
+def test_round_trip(created_at):
+    cursor = encode_cursor(_rec(created_at, 42))
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, 42)
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    "!!!",
+    _b64(b"not json"),
+    _b64(b"\xff\xfe"),
+    _b64(b"5"),
+    _b64(b'{"a": 1}'),
+    _b64(b'[1, 2]'),
+    _b64(b'["2025-08-16T06:26:33", 1, 2]'),
+    _b64(b'["yesterday", 1]'),
+    _b64(b'["2025-08-16T06:26:33", "x"]'),
+])
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as e:
+        decode_cursor(cursor)
+    assert e.value.status_code == 400
+
+
+def _sql(q) -> str:
+    return str(q.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.parametrize("descending, op, order", [
+    (True, "<", "DESC"),
+    (False, ">", "ASC"),
+])
+def test_apply_cursor_seeks_past_position(descending, op, order):
+    cursor = encode_cursor(_rec(datetime(2025, 1, 1), 7))
+    sql = _sql(apply_cursor(select(File.id), cursor, descending))
+    assert f"(files.created_at, files.id) {op} (" in sql
+    assert f"files.created_at {order}, files.id {order}" in sql
+
+
+def test_apply_cursor_first_page_has_no_filter():
+    sql = _sql(apply_cursor(select(File.id), None, True))
+    assert "WHERE" not in sql
+    assert "ORDER BY files.created_at DESC, files.id DESC" in sql
@@ -0,0 +1,101 @@
+import pytest
+from src.app.files import downloads
+
+pytestmark = pytest.mark.anyio
+
+
+class _Crash(Exception):
+    pass
+
+
+class _Database:
+    # files.downloads и download_flushes в памяти
+    def __init__(self):
+        self.downloads: dict[int, int] = {}
+        self.batches: set[str] = set()
+
+    async def apply_batch(self, session, batch, counts) -> bool:
+        if batch in self.batches:
+            return False
+        self.batches.add(batch)
+        for file_id, n in counts.items():
+            self.downloads[file_id] = self.downloads.get(file_id, 0) + n
+        return True
+
+    async def batch_applied(self, session, batch) -> bool:
+        return batch in self.batches
+
+
+class _Session:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = _Database()
+    monkeypatch.setattr(downloads, "apply_batch", database.apply_batch)
+    monkeypatch.setattr(downloads, "_batch_applied", database.batch_applied)
+    monkeypatch.setattr(downloads, "SessionLocal", _Session)
+    return database
+
+
+async def _download(file_id: int, times: int = 1) -> None:
+    for _ in range(times):
+        await downloads.record_download(None, file_id)
+
+
+async def test_flush_applies_counts_once(redis, db):
+    await _download(1, 3)
+    await _download(2)
+    assert await downloads.flush_downloads(None) == 2
+    assert db.downloads == {1: 3, 2: 1}
+    assert not await redis.exists(downloads.FLUSHING_KEY)
+    assert await downloads.flush_downloads(None) == 0
+    assert db.downloads == {1: 3, 2: 1}
+
+
+async def test_crash_after_commit_is_not_counted_twice(
+        redis, db, monkeypatch):
+    await _download(1, 3)
+    real = downloads.queue_invalidation
+
+    def crash(pipe, file_ids):
+        raise _Crash
+
+    # Процесс падает между commit и удалением хэша
+    monkeypatch.setattr(downloads, "queue_invalidation", crash)
+    with pytest.raises(_Crash):
+        await downloads.flush_downloads(None)
+    assert db.downloads == {1: 3}
+    assert await redis.exists(downloads.FLUSHING_KEY)
+    # Счётчик уже в строке: хэш сброса сверху не добавляется
+    await _download(1)
+    assert await downloads.pending_downloads([1]) == {1: 1}
+
+    monkeypatch.setattr(downloads, "queue_invalidation", real)
+    assert await downloads.flush_downloads(None) == 1
+    assert db.downloads == {1: 3}
+    assert not await redis.exists(downloads.FLUSHING_KEY)
+    assert await downloads.flush_downloads(None) == 1
+    assert db.downloads == {1: 4}
+
+
+async def test_crash_before_commit_is_retried(redis, db, monkeypatch):
+    await _download(1, 2)
+
+    async def fail(session, batch, counts):
+        raise _Crash
+
+    monkeypatch.setattr(downloads, "apply_batch", fail)
+    with pytest.raises(_Crash):
+        await downloads.flush_downloads(None)
+    # Не применённый сброс виден как ожидающий
+    assert await downloads.pending_downloads([1]) == {1: 2}
+
+    monkeypatch.setattr(downloads, "apply_batch", db.apply_batch)
+    assert await downloads.flush_downloads(None) == 1
+    assert db.downloads == {1: 2}
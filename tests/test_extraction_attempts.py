@@ -0,0 +1,27 @@
+import pytest
+from src.app.files import extraction
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_attempts_are_counted_per_file(redis):
+    assert await extraction.begin_attempts([1, 2]) == {1: 1, 2: 1}
+    assert await extraction.begin_attempts([1]) == {1: 2}
+    await extraction.forget_attempts([1])
+    assert await extraction.begin_attempts([1, 3]) == {1: 2, 3: 1}
+
+
+async def test_each_counter_expires_on_its_own(redis):
+    await extraction.begin_attempts([1])
+    await redis.expire(extraction.attempts_key(1), 5)
+    # Разбор других файлов не продлевает чужой счётчик
+    await extraction.begin_attempts([2])
+    assert await redis.ttl(extraction.attempts_key(1)) <= 5
+    assert await redis.ttl(extraction.attempts_key(2)) > 5
+
+
+async def test_clear_attempts(redis):
+    await extraction.begin_attempts([1, 2])
+    await extraction.clear_attempts([1])
+    assert not await redis.exists(extraction.attempts_key(1))
+    assert await redis.exists(extraction.attempts_key(2))
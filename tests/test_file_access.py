@@ -0,0 +1,44 @@
+import pytest
+from fastapi import HTTPException
+from src.app.auth.principal import Principal
+from src.app.common.enums import Role, Visibility
+from src.app.files.service import check_file_access
+
+OWNER = 1
+OTHER = 2
+
+
+def _user(role: Role, user_id: int = OTHER, department: str = "sales"):
+    return Principal(
+        id=user_id, email=f"{user_id}@example.com", role=role,
+        department=department)
+
+
+# (роль, свой файл, тот же отдел, видимость) -> доступ есть
+CASES = [
+    (Role.ADMIN, False, False, Visibility.PRIVATE, True),
+    (Role.ADMIN, False, False, Visibility.DEPARTMENT, True),
+    (Role.USER, True, True, Visibility.PRIVATE, True),
+    (Role.USER, False, True, Visibility.PRIVATE, False),
+    (Role.USER, False, True, Visibility.DEPARTMENT, True),
+    (Role.USER, False, False, Visibility.DEPARTMENT, False),
+    (Role.USER, False, False, Visibility.PUBLIC, True),
+    (Role.MANAGER, False, True, Visibility.PRIVATE, False),
+    (Role.MANAGER, True, True, Visibility.PRIVATE, True),
+    # Менеджер видит DEPARTMENT-файлы любого отдела
+    (Role.MANAGER, False, False, Visibility.DEPARTMENT, True),
+    (Role.MANAGER, False, False, Visibility.PUBLIC, True),
+]
+
+
+@pytest.mark.parametrize("role, own, same_department, visibility, allowed",
+                         CASES)
+def test_check_file_access(role, own, same_department, visibility, allowed):
+    user = _user(role, OWNER if own else OTHER)
+    department = "sales" if same_department else "legal"
+    if allowed:
+        check_file_access(user, OWNER, department, visibility)
+        return
+    with pytest.raises(HTTPException) as e:
+        check_file_access(user, OWNER, department, visibility)
+    assert e.value.status_code == 403
@@ -0,0 +1,103 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from src.app.common.enums import Visibility
+from src.app.files import cache
+
+pytestmark = pytest.mark.anyio
+
+FILE_ID = 7
+
+
+def _row(visibility: Visibility):
+    rec = SimpleNamespace(
+        id=FILE_ID, owner_id=1, department="dept-0", filename="a.pdf",
+        content_type="application/pdf", size_bytes=10,
+        visibility=visibility, downloads=0)
+    return SimpleNamespace(one_or_none=lambda: (rec, {}))
+
+
+class _Session:
+    # Сессия, чтение из которой ждёт, пока тест не отпустит его
+    def __init__(self, db):
+        self.db = db
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, statement):
+        row = _row(self.db.visibility)
+        self.db.reading.set()
+        await self.db.release.wait()
+        return row
+
+
+@pytest.fixture
+def db(monkeypatch):
+    state = SimpleNamespace(
+        visibility=Visibility.DEPARTMENT,
+        reading=asyncio.Event(),
+        release=asyncio.Event())
+    monkeypatch.setattr(cache, "SessionLocal", lambda: _Session(state))
+    monkeypatch.setattr(cache, "read_session", lambda: _Session(state))
+    return state
+
+
+async def test_miss_fills_cache(redis, db):
+    db.release.set()
+    cached = await cache.get_cached_file(FILE_ID)
+    assert cached.visibility == Visibility.DEPARTMENT
+    assert await redis.exists(cache.file_cache_key(FILE_ID))
+    again = await cache.get_cached_file(FILE_ID)
+    assert again == cached
+
+
+async def test_invalidation_during_miss_is_not_overwritten(redis, db):
+    miss = asyncio.create_task(cache.get_cached_file(FILE_ID))
+    await db.reading.wait()
+    # Пока промах читает старую строку, файл делают приватным
+    db.visibility = Visibility.PRIVATE
+    await cache.invalidate_files([FILE_ID])
+    db.release.set()
+    stale = await miss
+    assert stale.visibility == Visibility.DEPARTMENT
+    assert not await redis.exists(cache.file_cache_key(FILE_ID))
+    fresh = await cache.get_cached_file(FILE_ID)
+    assert fresh.visibility == Visibility.PRIVATE
+    assert await redis.exists(cache.file_cache_key(FILE_ID))
+
+
+async def test_invalidation_bumps_generation(redis, db):
+    await cache.invalidate_files([FILE_ID, FILE_ID + 1])
+    await cache.invalidate_files([FILE_ID])
+    assert await redis.get(cache.generation_key(FILE_ID)) == b"2"
+    assert await redis.get(cache.generation_key(FILE_ID + 1)) == b"1"
+    assert await redis.ttl(cache.generation_key(FILE_ID)) > 0
+
+
+async def test_new_file_is_read_from_primary(redis, db, monkeypatch):
+    sessions = []
+
+    def opened(name):
+        def factory():
+            sessions.append(name)
+            return _Session(db)
+        return factory
+
+    monkeypatch.setattr(cache, "replica_configured", lambda: True)
+    monkeypatch.setattr(cache, "SessionLocal", opened("primary"))
+    monkeypatch.setattr(cache, "read_session", opened("read"))
+    db.release.set()
+    await cache.mark_created([FILE_ID])
+    ttl = await redis.ttl(cache.dirty_key(FILE_ID))
+    assert ttl >= cache.settings.db_replica_max_lag \
+        + cache.settings.db_replica_check_interval
+    await cache.get_cached_file(FILE_ID)
+    assert sessions == ["primary"]
+    await redis.delete(
+        cache.dirty_key(FILE_ID), cache.file_cache_key(FILE_ID))
+    await cache.get_cached_file(FILE_ID)
+    assert sessions == ["primary", "read"]
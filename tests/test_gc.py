@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import BigInteger, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from src.app.auth.principal import Principal
+from src.app.common.enums import Role, UploadStatus
+from src.app.files import gc
+from src.app.files.models import (
+    Blob, File, ObjectTombstone, UploadSession, UploadPart)
+from src.app.files.routes import delete_file
+
+pytestmark = pytest.mark.anyio
+
+KEY = "uploads/1/report.pdf"
+ADMIN = Principal(
+    id=1, email="admin@example.com", role=Role.ADMIN, department="it")
+
+
+@compiles(BigInteger, "sqlite")
+def _bigint_sqlite(type_, compiler, **kw):
+    # BIGINT PRIMARY KEY в SQLite не автоинкрементный
+    return "INTEGER"
+
+
+@pytest.fixture
+async def session():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    tables = [t.__table__ for t in (
+        Blob, File, UploadSession, UploadPart, ObjectTombstone)]
+    async with engine.begin() as conn:
+        await conn.run_sync(File.metadata.create_all, tables=tables)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as s:
+        yield s
+    await engine.dispose()
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    removed = []
+
+    def remove_objects(keys):
+        removed.extend(keys)
+        return {}
+    monkeypatch.setattr(gc, "remove_objects", remove_objects)
+    return removed
+
+
+async def _finalized_upload(session, status=UploadStatus.COMPLETED) -> File:
+    rec = File(
+        owner_id=1, department="it", filename="report.pdf",
+        content_type="application/pdf", size_bytes=10, s3_key=KEY)
+    session.add(rec)
+    await session.flush()
+    session.add(UploadSession(
+        id="a" * 32, owner_id=1, department="it", filename="report.pdf",
+        content_type="application/pdf", size_bytes=10, s3_key=KEY,
+        part_size=5, part_count=2, status=status, file_id=rec.id))
+    await session.commit()
+    return rec
+
+
+async def test_delete_after_multipart_finalize_removes_object(
+        redis, session, storage):
+    rec = await _finalized_upload(session)
+    await delete_file(rec.id, session, ADMIN)
+    assert await gc.reap_tombstones(session) == 1
+    assert storage == [KEY]
+    assert not (await session.execute(select(ObjectTombstone))).all()
+
+
+async def test_active_upload_keeps_object(session, storage):
+    await _finalized_upload(session, status=UploadStatus.ACTIVE)
+    await gc.add_tombstones(session, [KEY])
+    await session.commit()
+    assert await gc.reap_tombstones(session) == 0
+    assert storage == []
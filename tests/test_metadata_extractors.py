@@ -0,0 +1,48 @@
+import io
+from src.app.files.utils.metadata_extractors import _collect_text, extract_pdf
+
+
+def _pdf(text: bytes, title: bytes) -> bytes:
+    # Одностраничный PDF: строки как есть попадают в поток страницы
+    # и в /Info, \000 в литерале PDF - это NUL
+    stream = b"BT /F1 10 Tf 40 740 Td (%s) Tj ET" % text
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [5 0 R] /Count 1 >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources << /Font << /F1 3 0 R >> >> /Contents 4 0 R >>",
+        b"<< /Title (%s) >>" % title,
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (num, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R /Info 6 0 R >>\n" % (
+        len(objects) + 1)
+    out += b"startxref\n%d\n%%%%EOF\n" % xref
+    return bytes(out)
+
+
+def test_collect_text_drops_nul():
+    text = _collect_text(["first\x00page", "\x00\x00", " second  page "], 100)
+    assert text == "first page second page"
+
+
+def test_collect_text_limit():
+    assert _collect_text(["a" * 10, "b" * 10], 15) == "a" * 10 + " bbbb"
+
+
+def test_extract_pdf_without_nul():
+    meta, text = extract_pdf(
+        io.BytesIO(_pdf(rb"quarterly\000report", rb"Q3\000 summary")), 100)
+    assert text == "quarterly report"
+    assert meta["title"] == "Q3 summary"
+    assert meta["pages"] == 1
+    assert "\x00" not in meta["title"] + text
@@ -0,0 +1,43 @@
+from collections import OrderedDict
+import pytest
+from src.app.auth import principal as cache
+from src.app.auth.principal import Principal
+from src.app.common.enums import Role
+
+pytestmark = pytest.mark.anyio
+
+ALICE = Principal(
+    id=1, email="alice@example.com", role=Role.MANAGER, department="sales")
+
+
+@pytest.fixture(autouse=True)
+def local(monkeypatch):
+    monkeypatch.setattr(cache, "_local", OrderedDict())
+    return cache._local
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    def use(name: str) -> None:
+        monkeypatch.setattr(cache.settings, "principal_cache_backend", name)
+    return use
+
+
+async def test_redis_invalidation_is_seen_by_other_replicas(
+        redis, backend, local):
+    backend("redis")
+    await cache.cache_principal(ALICE)
+    assert await cache.get_cached_principal(ALICE.email) == ALICE
+    # Роль сменили на другой реплике: она удаляет только ключ в Redis
+    await redis.delete(cache.REDIS_PREFIX + ALICE.email)
+    assert await cache.get_cached_principal(ALICE.email) is None
+    assert not local
+
+
+async def test_memory_backend_stays_in_process(redis, backend):
+    backend("memory")
+    await cache.cache_principal(ALICE)
+    assert await cache.get_cached_principal(ALICE.email) == ALICE
+    assert not await redis.exists(cache.REDIS_PREFIX + ALICE.email)
+    await cache.invalidate_principal(ALICE.email)
+    assert await cache.get_cached_principal(ALICE.email) is None
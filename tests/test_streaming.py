@@ -0,0 +1,86 @@
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from src.app.files.streaming import (download_headers, is_not_modified,
+                                     parse_range)
+
+SIZE = 1000
+ETAG = '"abc"'
+MODIFIED = "Sat, 16 Aug 2025 06:26:33 GMT"
+
+
+def _rec(etag: str | None = "abc"):
+    return SimpleNamespace(
+        etag=etag, size_bytes=SIZE, filename="отчёт 1.pdf",
+        created_at=datetime(2025, 8, 16, 6, 26, 33, 72474))
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, SIZE - 1)),
+    ("bytes=-100", (SIZE - 100, SIZE - 1)),
+    ("bytes=-5000", (0, SIZE - 1)),
+    ("bytes=990-5000", (990, SIZE - 1)),
+    (" bytes=0-0 ", (0, 0)),
+    # Несколько диапазонов и чужие единицы: весь объект
+    ("bytes=0-1,5-9", None),
+    ("items=0-1", None),
+    ("bytes=-", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, None, _rec()) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=5-1"])
+def test_unsatisfiable_range_is_416(header):
+    with pytest.raises(HTTPException) as e:
+        parse_range(header, None, _rec())
+    assert e.value.status_code == 416
+    assert e.value.headers["Content-Range"] == f"bytes */{SIZE}"
+
+
+@pytest.mark.parametrize("if_range, expected", [
+    (ETAG, (0, 9)),
+    ('"stale"', None),
+    (MODIFIED, None),
+])
+def test_if_range(if_range, expected):
+    assert parse_range("bytes=0-9", if_range, _rec()) == expected
+
+
+@pytest.mark.parametrize("if_none_match, if_modified_since, expected", [
+    (None, None, False),
+    (ETAG, None, True),
+    ('W/"abc"', None, True),
+    ('"x", "abc"', None, True),
+    ("*", None, True),
+    ('"x"', None, False),
+    # If-None-Match важнее If-Modified-Since
+    ('"x"', MODIFIED, False),
+    (None, MODIFIED, True),
+    (None, "Sat, 16 Aug 2025 06:26:32 GMT", False),
+    (None, "not a date", False),
+])
+def test_is_not_modified(if_none_match, if_modified_since, expected):
+    assert is_not_modified(_rec(), if_none_match, if_modified_since) \
+        is expected
+
+
+def test_without_etag_only_dates_apply():
+    rec = _rec(etag=None)
+    assert not is_not_modified(rec, "*", None)
+    assert is_not_modified(rec, None, MODIFIED)
+    assert parse_range("bytes=0-9", ETAG, rec) is None
+
+
+def test_download_headers():
+    headers = download_headers(_rec())
+    assert headers["ETag"] == ETAG
+    assert headers["Last-Modified"] == MODIFIED
+    assert headers["Accept-Ranges"] == "bytes"
+    assert headers["Content-Disposition"] == (
+        "attachment; filename*=UTF-8''%D0%BE%D1%82%D1%87%D1%91%D1%82"
+        "%201.pdf")